@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Banc d'essai hors ligne des extracteurs, sur des pages enregistrées
+(RECORD_DIR=fixtures python scrape_airbnb.py)
+
+    python bench_extractors.py fixtures                  # extracteurs purs (sans navigateur)
+    python bench_extractors.py fixtures --browser        # parse_listing / collecte rejoués dans Chromium
+    python bench_extractors.py fixtures --merge-rows 50000
+    python bench_extractors.py fixtures --save bench_baseline.json
+    python bench_extractors.py fixtures --compare bench_baseline.json
+
+Affiche annonces/s, p50/p95 par étape, mémoire de pointe et taux de remplissage
+des champs. --compare échoue (code 1) si une étape est plus lente que la
+référence au-delà de --tolerance, ou si un champ est moins souvent rempli.
+"""
+
+import os
+import re
+import csv
+import sys
+import time
+import json
+import argparse
+import tempfile
+import resource
+import tracemalloc
+
+# Tout doit rester hors ligne et sans effet de bord: à fixer avant les imports du scraper
+os.environ["METRICS_FILE"] = ""
+os.environ["CACHE_DB"] = ""
+os.environ["RECORD_DIR"] = ""
+os.environ["SELECTOR_MEMORY"] = ""
+
+import run_metrics
+from run_metrics import timer, count
+from html_fixtures import load_index
+from text_extract import extract_text_fields, profile_hrefs
+
+FIELDS = ("title", "license_code", "host_name", "host_overall_rating", "host_profile_url", "host_joined")
+RE_TAGS = re.compile(r"<script.*?</script>|<style.*?</style>|<[^>]+>", re.S | re.I)
+
+def load_fixtures(path):
+    entries = list(load_index(path).values())
+    for e in entries:
+        with open(os.path.join(path, e["file"]), encoding="utf-8") as f:
+            e["html"] = f.read()
+    return [e for e in entries if e["kind"] == "listing"], [e for e in entries if e["kind"] == "search"]
+
+def peak_rss_mb():
+    # ru_maxrss est en Ko sous Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def bench_pure(listings, searches, repeat):
+    """Extracteurs sans navigateur: JSON embarqué, texte, liens hôte, cartes de recherche"""
+    from scrape_airbnb import extract_embedded_fields, load_embedded_json, rooms_from_search_json
+
+    fills = {k: 0 for k in FIELDS}
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for r in range(repeat):
+        for e in listings:
+            html, url = e["html"], e["url"]
+            with timer("bench.listing"):
+                with timer("bench.embedded_json"):
+                    fields, _ = extract_embedded_fields(html, url)
+                with timer("bench.text_fields"):
+                    text = extract_text_fields(RE_TAGS.sub(" ", html))
+                with timer("bench.profile_hrefs"):
+                    hrefs = profile_hrefs(html)
+            if r == 0:
+                for k in FIELDS:
+                    if fields.get(k) or text.get(k) or (k == "host_profile_url" and hrefs):
+                        fills[k] += 1
+        for e in searches:
+            with timer("bench.search_json"):
+                ids = [i for blob in load_embedded_json(e["html"]) for i in rooms_from_search_json(blob)[0]]
+            if r == 0:
+                count("bench.search_ids", len(set(ids)))
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n = len(listings) * repeat
+    return {
+        "listings_per_s": round(n / elapsed, 1) if elapsed and n else 0.0,
+        "peak_alloc_mb": round(peak / 1024 / 1024, 1),
+        "fill": fills,
+    }
+
+def bench_browser(path, listings, searches):
+    """parse_listing et collect_listing_urls dans Chromium, réseau remplacé par les captures"""
+    os.environ["REPLAY_DIR"] = path
+    import scrape_airbnb
+    from playwright.sync_api import sync_playwright
+
+    fills = {k: 0 for k in FIELDS}
+    with sync_playwright() as p:
+        browser = scrape_airbnb.launch_browser(p)
+        context = scrape_airbnb.new_context(browser)
+        page = context.new_page()
+        t0 = time.perf_counter()
+        for e in listings:
+            row = scrape_airbnb.parse_listing(page, e["url"])
+            for k in FIELDS:
+                if row.get(k):
+                    fills[k] += 1
+        elapsed = time.perf_counter() - t0
+        for e in searches:
+            with timer("bench.collect"):
+                urls = scrape_airbnb.collect_listing_urls(page, 10000, 1, e["url"])
+            count("bench.search_urls", len(urls))
+        context.close()
+        browser.close()
+    return {
+        "listings_per_s": round(len(listings) / elapsed, 2) if elapsed and listings else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "fill": fills,
+    }
+
+def bench_merge(n_rows):
+    """merge_results sur n_rows annonces synthétiques (un hôte pour 3 annonces)"""
+    import merge_results
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            os.makedirs("output_phase1")
+            os.makedirs("output_phase2")
+            with open("output_phase1/page_1_listings.csv", "w", encoding="utf-8-sig", newline="") as f:
+                w = csv.writer(f)
+                w.writerow(["url", "title", "license_code", "host_name", "host_overall_rating",
+                            "host_profile_url", "host_joined", "scraped_at"])
+                for i in range(n_rows):
+                    w.writerow([f"https://www.airbnb.com/rooms/{i}", f"Annonce {i}", f"{i:08d}", "Hôte", "4.9",
+                                f"https://www.airbnb.com/users/show/{i // 3}", "2019", "2025-01-01T00:00:00+00:00"])
+            with open("output_phase2/page_1_hosts.csv", "w", encoding="utf-8", newline="") as f:
+                w = csv.writer(f)
+                w.writerow(["url", "name", "rating", "joined_year", "years_active", "listing_count", "notes"])
+                for h in range(0, n_rows // 3, 2):
+                    w.writerow([f"https://www.airbnb.com/users/show/{h}", "Hôte", "4.9", "2019", "6", "3", ""])
+            t0 = time.perf_counter()
+            with timer("bench.merge"):
+                merge_results.merge_results()
+            elapsed = time.perf_counter() - t0
+        finally:
+            os.chdir(cwd)
+    return {"rows_per_s": round(n_rows / elapsed, 1) if elapsed else 0.0, "peak_rss_mb": peak_rss_mb()}
+
+def compare(result, baseline, tolerance):
+    """Liste des régressions par rapport à une référence sauvegardée"""
+    problems = []
+    for stage, st in result["timers"].items():
+        ref = baseline.get("timers", {}).get(stage)
+        if ref and ref["p50_ms"] and st["p50_ms"] > ref["p50_ms"] * (1 + tolerance):
+            problems.append(f"{stage}: p50 {st['p50_ms']} ms (référence {ref['p50_ms']} ms)")
+    for mode in ("pure", "browser"):
+        for k, n in result.get(mode, {}).get("fill", {}).items():
+            ref = baseline.get(mode, {}).get("fill", {}).get(k)
+            if ref is not None and n < ref:
+                problems.append(f"{mode}.{k}: rempli {n} fois (référence {ref})")
+    return problems
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Banc d'essai hors ligne des extracteurs")
+    ap.add_argument("fixtures", help="Dossier enregistré avec RECORD_DIR")
+    ap.add_argument("--repeat", type=int, default=5, help="Passes sur les extracteurs purs")
+    ap.add_argument("--browser", action="store_true", help="Rejouer aussi dans Chromium")
+    ap.add_argument("--merge-rows", type=int, default=0, help="Mesurer merge_results sur N lignes synthétiques")
+    ap.add_argument("--save", help="Écrire le résultat (JSON) comme référence")
+    ap.add_argument("--compare", help="Comparer à une référence sauvegardée")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Ralentissement toléré (0.25 = +25%%)")
+    args = ap.parse_args(argv)
+
+    listings, searches = load_fixtures(args.fixtures)
+    if not listings and not searches:
+        raise SystemExit(f"❌ Aucune page enregistrée dans {args.fixtures} (lancez le scraper avec RECORD_DIR)")
+    print(f"📼 {len(listings)} annonce(s), {len(searches)} page(s) de recherche")
+
+    if args.browser:
+        # avant tout import de scrape_airbnb: aucune navigation ne doit sortir
+        os.environ["REPLAY_DIR"] = args.fixtures
+    result = {"pure": bench_pure(listings, searches, args.repeat)}
+    if args.browser:
+        result["browser"] = bench_browser(args.fixtures, listings, searches)
+    if args.merge_rows:
+        result["merge"] = bench_merge(args.merge_rows)
+
+    s = run_metrics.print_summary()
+    result.update(timers=s["timers"], counters=s["counters"])
+    print(f"\n🏁 RÉSULTATS")
+    for mode in ("pure", "browser", "merge"):
+        if mode in result:
+            print(f"   {mode}: {json.dumps(result[mode], ensure_ascii=False)}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=1)
+        print(f"💾 Référence écrite: {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            problems = compare(result, json.load(f), args.tolerance)
+        if problems:
+            print(f"\n❌ {len(problems)} régression(s):")
+            for p in problems:
+                print(f"   • {p}")
+            sys.exit(1)
+        print("\n✅ Aucune régression par rapport à la référence")
+
+if __name__ == "__main__":
+    main()
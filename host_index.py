@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Index persistant des hôtes (SQLite), partagé entre pages et entre runs
+Clé: identifiant numérique de l'hôte, que le lien soit /users/show/<id> ou
+/users/profile/<id>. Valeur: la dernière ligne Phase 2 et sa date.
+
+Un hôte scrapé il y a moins de HOST_TTL_HOURS n'est pas renvoyé en Phase 2:
+sa ligne enregistrée est réutilisée pour la fusion.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import datetime
+import threading
+
+from listing_cache import age_hours
+
+HOST_INDEX_DB  = os.getenv("HOST_INDEX_DB", "host_index.sqlite").strip()   # vide = dédup du run seulement
+HOST_TTL_HOURS = float(os.getenv("HOST_TTL_HOURS", "720"))
+
+RE_HOST_ID = re.compile(r"/users/(?:show|profile)/(\d+)")
+
+_lock = threading.Lock()
+_conn = [None]
+
+def host_id(url):
+    """'https://fr.airbnb.ca/users/profile/123?x=1' -> '123' ('' si pas d'identifiant)"""
+    m = RE_HOST_ID.search(url or "")
+    return m.group(1) if m else ""
+
+def canonical_host_url(url):
+    hid = host_id(url)
+    return f"https://www.airbnb.com/users/show/{hid}" if hid else (url or "").split("?")[0].strip()
+
+def host_key(url):
+    """Clé de jointure: identifiant numérique, sinon l'URL sans paramètres"""
+    return host_id(url) or (url or "").split("?")[0].strip()
+
+def _db():
+    if _conn[0] is None:
+        conn = sqlite3.connect(HOST_INDEX_DB, check_same_thread=False)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS hosts (
+                host_id    TEXT PRIMARY KEY,
+                url        TEXT NOT NULL,
+                data       TEXT NOT NULL,
+                scraped_at TEXT NOT NULL
+            )
+        """)
+        conn.commit()
+        _conn[0] = conn
+    return _conn[0]
+
+def host_row_ok(row):
+    """Ligne Phase 2 exploitable: ni erreur (notes "Erreur: ..." de scraper.js), ni nom vide"""
+    return (not row.get("error") and bool((row.get("name") or "").strip())
+            and not (row.get("notes") or "").strip().startswith("Erreur"))
+
+def hosts_fresh(urls):
+    """{clé hôte: ligne Phase 2} des hôtes scrapés il y a moins de HOST_TTL_HOURS"""
+    if not HOST_INDEX_DB:
+        return {}
+    keys = list(dict.fromkeys(host_key(u) for u in urls if host_key(u)))
+    out = {}
+    with _lock:
+        db = _db()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            cur = db.execute(f"SELECT host_id, data, scraped_at FROM hosts "
+                             f"WHERE host_id IN ({','.join('?' * len(chunk))})", chunk)
+            for key, data, scraped_at in cur.fetchall():
+                row = json.loads(data)
+                if age_hours(scraped_at) <= HOST_TTL_HOURS and host_row_ok(row):
+                    out[key] = row
+    return out
+
+def hosts_store(rows, scraped_at=None):
+    """
+    Enregistre des lignes Phase 2 (colonne `url`) comme scrapées à `scraped_at`.
+    Les échecs ne sont pas enregistrés: l'hôte sera retenté au prochain passage.
+    """
+    if not HOST_INDEX_DB:
+        return 0
+    scraped_at = scraped_at or datetime.datetime.now(datetime.timezone.utc).isoformat()
+    items = [(host_key(r.get("url")), canonical_host_url(r.get("url")),
+              json.dumps(r, ensure_ascii=False), scraped_at)
+             for r in rows if host_key(r.get("url")) and host_row_ok(r)]
+    with _lock:
+        db = _db()
+        db.executemany("INSERT OR REPLACE INTO hosts (host_id, url, data, scraped_at) VALUES (?, ?, ?, ?)", items)
+        db.commit()
+    return len(items)
+
+def host_index_close():
+    with _lock:
+        if _conn[0] is not None:
+            _conn[0].close()
+            _conn[0] = None
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Phase 2 en Python: profils hôtes scrapés dans le même process que les
+annonces (HOST_STAGE=1 ou `scrape_airbnb.py --hosts`)
+
+- chaque lien hôte trouvé sur une annonce est mis en file dès que l'annonce
+  est finie (dédup par identifiant dans le process + index persistant)
+- HOST_CONCURRENCY workers dédiés (un navigateur chacun, lancé au premier
+  profil en file) scrapent les profils pendant que les annonces continuent
+- chaque ligne est ajoutée au CSV hôtes (HOSTS_DIR) et à l'index dès qu'elle
+  est prête: la fusion la lit comme un résultat scraper.js
+
+Extraction reprise de scraper.js: nom, note, année d'inscription, ancienneté,
+nombre d'annonces, notes (champs manquants ou erreur).
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import queue
+import datetime
+import threading
+
+from run_metrics import count
+from run_events import emit
+from host_index import host_key, canonical_host_url, hosts_fresh, hosts_store
+
+HOST_STAGE = "--hosts" in sys.argv or os.getenv("HOST_STAGE", "").strip().lower() in ("1", "true", "yes")
+HOST_CONCURRENCY = max(1, int(os.getenv("HOST_CONCURRENCY", "2")))
+HOSTS_DIR = os.getenv("HOSTS_DIR", "").strip()   # vide = à côté du CSV des annonces
+HOST_FIELDS = ["url", "name", "rating", "joined_year", "years_active", "listing_count", "notes"]
+FIRST_YEAR = 2007
+
+# ---------------- extraction ----------------
+
+RE_YEAR = re.compile(r"(?<!\d)(?:19|20)\d{2}(?!\d)")
+RE_JOINED = [re.compile(p, re.I) for p in (
+    r"Membre\s+depuis\s+(?:[A-Za-zÀ-ÖØ-öø-ÿ]+\s+)?(\d{4})",
+    r"Depuis\s+(?:[A-Za-zÀ-ÖØ-öø-ÿ]+\s+)?(\d{4})",
+    r"Inscrit[ e]*\s+(?:en|depuis)\s+(?:[A-Za-zÀ-ÖØ-öø-ÿ]+\s+)?(\d{4})",
+    r"Joined\s+in\s+(?:[A-Za-z]+\s+)?(\d{4})",
+    r"Member\s+since\s+(?:[A-Za-z]+\s+)?(\d{4})",
+    r"On\s+Airbnb\s+since\s+(?:[A-Za-z]+\s+)?(\d{4})",
+    r"Sur\s+Airbnb\s+depuis\s+(?:[A-Za-z]+\s+)?(\d{4})",
+)]
+RE_JOINED_AROUND = re.compile(r"(?:membre|since|joined|inscrit|depuis)[^0-9]{0,20}((?:19|20)\d{2})", re.I)
+RE_JOINED_KEY = re.compile(r"membersince|since|createdat|created_at|joindate|join_date")
+RE_LISTING_COUNT = [re.compile(r"(\d{1,4})\s+(?:annonces|hébergements|logements)", re.I),
+                    re.compile(r"(\d{1,4})\s+listings?", re.I)]
+RE_RATING = [re.compile(p, re.I) for p in (
+    r"([0-9]+[.,][0-9]+)\s+évaluations?",
+    r"★\s*([0-9]+[.,][0-9]+)",
+    r"⭐\s*([0-9]+[.,][0-9]+)",
+    r"Note\s+globale\s*:?\s*([0-9]+[.,][0-9]+)",
+    r"Moyenne\s*:?\s*([0-9]+[.,][0-9]+)",
+    r"([0-9]+[.,][0-9]+)\s+rating",
+    r"([0-9]+[.,][0-9]+)\s+reviews?",
+)]
+NAME_KEYS = ("fullName", "displayName", "hostName", "publicName", "smartName", "name", "userName", "firstName")
+NAME_PREFIXES = re.compile(r"^(?:Quelques informations sur|Profil de|À propos de|About)\s+", re.I)
+RE_NAME_IN = [re.compile(p, re.I) for p in (
+    r"Quelques informations sur\s+([^|–—\-•\n]+)",
+    r"Profil de\s+([^|–—\-•\n]+)",
+    r"(?:À propos de|About)\s+([^|–—\-•\n]+)",
+)]
+RE_NAME_HTML = [re.compile(p, re.I) for p in (
+    r"Quelques informations sur\s*([^<|–—\-]+)",
+    r"Profil de\s*([^<|–—\-]+)",
+    r"(?:À propos de|About)\s*([^<|–—\-]+)",
+)]
+RE_NAME_TEXT = re.compile(r"(?:Quelques informations sur|Profil de)\s+([^\n|]+)", re.I)
+
+def this_year():
+    return datetime.datetime.now(datetime.timezone.utc).year
+
+def year_from_any(val, now_year=None):
+    """Année 2007..now depuis un timestamp (s ou ms) ou une chaîne, sinon None"""
+    now_year = now_year or this_year()
+    y = None
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
+        try:
+            y = datetime.datetime.fromtimestamp(val / 1000 if val > 1e12 else val, datetime.timezone.utc).year
+        except (OverflowError, OSError, ValueError):
+            return None
+    elif isinstance(val, str):
+        m = RE_YEAR.search(val)
+        y = int(m.group(0)) if m else None
+    return y if y and FIRST_YEAR <= y <= now_year else None
+
+def joined_year_from_json(blobs, now_year=None):
+    """Parcours en largeur: clé du type memberSince/createdAt, sinon première chaîne datée"""
+    todo = list(blobs)
+    while todo:
+        cur = todo.pop(0)
+        items = cur.items() if isinstance(cur, dict) else enumerate(cur) if isinstance(cur, list) else ()
+        for k, v in items:
+            if isinstance(v, (dict, list)):
+                todo.append(v)
+            if RE_JOINED_KEY.search(str(k).lower()):
+                y = year_from_any(v, now_year)
+                if y:
+                    return y
+            if isinstance(v, str) and RE_YEAR.search(v):
+                y = year_from_any(v, now_year)
+                if y:
+                    return y
+    return None
+
+def joined_year_from_text(text, html, now_year=None):
+    """Motifs "Membre depuis 2016" dans le texte visible, puis dans le HTML"""
+    now_year = now_year or this_year()
+    for src in (text, html):
+        for rx in RE_JOINED + [RE_JOINED_AROUND]:
+            m = rx.search(src)
+            if m and FIRST_YEAR <= int(m.group(1)) <= now_year:
+                return int(m.group(1))
+    return None
+
+def listing_count(text, html):
+    """Plus grand nombre d'annonces cité (1..1000), sinon None"""
+    found = [int(m.group(1)) for rx in RE_LISTING_COUNT for src in (text, html) for m in rx.finditer(src)]
+    found = [n for n in found if 0 < n <= 1000]
+    return max(found) if found else None
+
+def rating_value(raw):
+    try:
+        val = float(str(raw).replace(",", "."))
+    except ValueError:
+        return None
+    return val if 1 <= val <= 5 else None
+
+def host_rating(ld_json, text, html):
+    """aggregateRating du JSON-LD, sinon motifs texte (1..5)"""
+    for raw in ld_json:
+        try:
+            obj = json.loads(raw)
+        except ValueError:
+            continue
+        for it in obj if isinstance(obj, list) else [obj]:
+            v = (it.get("aggregateRating") or {}).get("ratingValue") if isinstance(it, dict) else None
+            if v is not None and rating_value(v) is not None:
+                return rating_value(v)
+    for rx in RE_RATING:
+        m = rx.search(text) or rx.search(html)
+        if m and rating_value(m.group(1)) is not None:
+            return rating_value(m.group(1))
+    return None
+
+def clean_name(s):
+    if not s:
+        return None
+    s = s.strip()
+    if re.match(r"Airbnb\s*:", s) or re.search(r"locations de vacances", s, re.I):
+        return None
+    s = NAME_PREFIXES.sub("", s)
+    s = re.sub(r"\s*[-–—]\s*Airbnb.*$", "", s, flags=re.I)
+    s = re.split(r"[|•]", s)[0].strip()
+    return s[:80].strip() or None
+
+def deep_find_name(obj, depth=0):
+    if not isinstance(obj, (dict, list)) or depth > 8:
+        return None
+    items = list(obj.items()) if isinstance(obj, dict) else list(enumerate(obj))
+    for k, v in items:
+        if isinstance(v, str) and k in NAME_KEYS:
+            c = clean_name(v)
+            if c and "airbnb" not in c.lower():
+                return c
+    for _, v in items:
+        got = deep_find_name(v, depth + 1)
+        if got:
+            return got
+    return None
+
+def host_name(blobs, h1, meta_title, meta_desc, text, html):
+    for blob in blobs:
+        n = deep_find_name(blob)
+        if n:
+            return n
+    candidates = [c for c in (h1, meta_title, meta_desc) if c]
+    for rx in RE_NAME_HTML:
+        m = rx.search(html)
+        if m:
+            candidates.append(m.group(1))
+            break
+    for raw in candidates:
+        for rx in RE_NAME_IN:
+            m = rx.search(raw)
+            if m and clean_name(m.group(1)):
+                return clean_name(m.group(1))
+        if clean_name(raw):
+            return clean_name(raw)
+    m = RE_NAME_TEXT.search(text)
+    return clean_name(m.group(1)) if m else None
+
+def host_profile_row(url, page_data, html, blobs, now_year=None):
+    """
+    Ligne Phase 2 (mêmes colonnes que scraper.js) depuis le DOM d'un profil:
+    page_data = {"h1", "metaTitle", "metaDesc", "text", "ldJson"} (PROFILE_JS)
+    """
+    now_year = now_year or this_year()
+    text = page_data.get("text") or ""
+    row = {k: "" for k in HOST_FIELDS}
+    row["url"] = url
+    row["name"] = host_name(blobs, page_data.get("h1"), page_data.get("metaTitle"),
+                            page_data.get("metaDesc"), text, html) or ""
+    rating = host_rating(page_data.get("ldJson") or [], text, html)
+    row["rating"] = rating if rating is not None else ""
+    row["listing_count"] = listing_count(text, html) or ""
+    # Texte du profil d'abord ("Membre depuis 2016"): le JSON contient des identifiants et URLs
+    year = joined_year_from_text(text, html, now_year) or joined_year_from_json(blobs, now_year)
+    if year:
+        row["joined_year"] = year
+        row["years_active"] = now_year - year
+    missing = [k for k in ("name", "rating", "joined_year", "listing_count") if row[k] == ""]
+    if missing:
+        row["notes"] = f"Champs manquants: {', '.join(missing)}"
+    return row
+
+# ---------------- file d'attente et sortie en flux ----------------
+
+def hosts_csv_for(out_csv):
+    """output_phase1/page_3_listings.csv -> HOSTS_DIR/page_3_hosts.csv"""
+    stem = os.path.splitext(os.path.basename(out_csv))[0]
+    if stem.endswith("_listings"):
+        stem = stem[:-len("_listings")]
+    return os.path.join(HOSTS_DIR or os.path.dirname(out_csv), f"{stem}_hosts.csv")
+
+_claim_lock = threading.Lock()
+_claimed = set()   # hôtes pris en charge par ce process (toutes pages confondues)
+
+class HostStage:
+    """
+    Hôtes d'une page de recherche: file de profils à scraper, CSV écrit au fil
+    de l'eau, index persistant mis à jour ligne par ligne.
+    """
+
+    def __init__(self, out_csv, concurrency=HOST_CONCURRENCY):
+        self.path = hosts_csv_for(out_csv)
+        self.concurrency = concurrency
+        self.jobs = queue.Queue()
+        self.listings_done = threading.Event()   # plus aucun submit() à venir
+        self.lock = threading.Lock()
+        self.written = 0
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self.file = open(self.path, "a", encoding="utf-8", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=HOST_FIELDS, extrasaction="ignore")
+        if new_file:
+            self.writer.writeheader()
+            self.file.flush()
+
+    def submit(self, urls):
+        """Met en file les hôtes jamais vus; ceux encore frais dans l'index sont écrits tels quels"""
+        with _claim_lock:
+            new = {}
+            for u in urls:
+                k = host_key(u)
+                if k and k not in _claimed and k not in new:
+                    new[k] = canonical_host_url(u)
+            _claimed.update(new)
+        if not new:
+            return 0
+        cached = hosts_fresh(list(new.values()))
+        for row in cached.values():
+            self.write(row, store=False)
+        n = 0
+        for k, u in new.items():
+            if k not in cached:
+                self.jobs.put(u)
+                n += 1
+        if cached:
+            count("host.cached", len(cached))
+        if n:
+            count("host.queued", n)
+            emit("host.queued", n=n)
+        return n
+
+    def write(self, row, store=True):
+        with self.lock:
+            self.writer.writerow({k: row.get(k, "") for k in HOST_FIELDS})
+            self.file.flush()
+            self.written += 1
+        if store:
+            emit("host.finished", url=row.get("url", ""), error=row.get("error", ""))
+        if store and not row.get("error"):
+            hosts_store([{k: row.get(k, "") for k in HOST_FIELDS}])
+
+    def next_job(self, poll=0.5):
+        """Prochain profil à scraper; attend tant que des annonces peuvent en ajouter (None: terminé)"""
+        while True:
+            try:
+                return self.jobs.get(timeout=poll)
+            except queue.Empty:
+                if self.listings_done.is_set():
+                    return None
+
+    def finish_listings(self):
+        self.listings_done.set()
+
+    def skip_rest(self, reason):
+        """Vide la file (budget épuisé): ces hôtes seront repris au prochain run"""
+        while True:
+            try:
+                url = self.jobs.get_nowait()
+            except queue.Empty:
+                return
+            count("host.skipped", reason=reason)
+            emit("host.skipped", url=url, reason=reason)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+        print(f"👥 Hôtes: {self.written} ligne(s) → {self.path}")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Enregistrement et rejeu hors ligne des pages Airbnb
+
+- RECORD_DIR=fixtures : chaque page de recherche et chaque annonce visitée est
+  sauvegardée (DOM rendu) dans RECORD_DIR, avec un index url -> fichier
+  (index.jsonl). RECORD_HAR=1 enregistre en plus le trafic réseau en HAR.
+- REPLAY_DIR=fixtures : le navigateur ne touche plus le réseau; les navigations
+  vers une URL enregistrée reçoivent le HTML sauvegardé (scripts désactivés par
+  CSP pour que le DOM rendu reste tel quel), tout le reste est bloqué.
+  REPLAY_HAR=fichier.har rejoue un HAR à la place.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from listing_cache import canonical_room_url
+from run_metrics import count
+
+RECORD_DIR = os.getenv("RECORD_DIR", "").strip()
+RECORD_HAR = os.getenv("RECORD_HAR", "").strip().lower() in ("1", "true", "yes")
+REPLAY_DIR = os.getenv("REPLAY_DIR", "").strip()
+REPLAY_HAR = os.getenv("REPLAY_HAR", "").strip()
+INDEX_FILE = "index.jsonl"
+
+_lock = threading.Lock()
+_har_seq = [0]
+
+def fixture_key(url):
+    """Clé stable d'une URL: annonce canonique, sinon chemin + query triée (sans domaine)"""
+    if "/rooms/" in url:
+        return canonical_room_url(url)
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return parts.path + ("?" + query if query else "")
+
+def load_index(path):
+    """{clé: {"url", "kind", "file"}} (la dernière capture d'une URL l'emporte)"""
+    index = {}
+    try:
+        f = open(os.path.join(path, INDEX_FILE), encoding="utf-8")
+    except OSError:
+        return index
+    with f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            index[fixture_key(entry["url"])] = entry
+    return index
+
+def save_fixture(path, url, kind, html):
+    """Écrit le HTML sous `path` et l'ajoute à l'index; retourne le nom du fichier"""
+    name = f"{kind}_{hashlib.sha1(fixture_key(url).encode('utf-8')).hexdigest()[:12]}.html"
+    with _lock:
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, name), "w", encoding="utf-8") as f:
+            f.write(html)
+        with open(os.path.join(path, INDEX_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"url": url, "kind": kind, "file": name}, ensure_ascii=False) + "\n")
+    return name
+
+def record_page(page, url, kind):
+    """Sauvegarde le DOM rendu de `page` pour `url` si RECORD_DIR est défini"""
+    if not RECORD_DIR:
+        return
+    try:
+        save_fixture(RECORD_DIR, url, kind, page.content())
+        count("fixture.recorded", kind=kind)
+    except Exception as e:
+        print(f"⚠ Capture {kind} non sauvegardée: {e}")
+
+def context_options():
+    """Options de browser.new_context pour l'enregistrement HAR"""
+    if not (RECORD_DIR and RECORD_HAR):
+        return {}
+    with _lock:
+        _har_seq[0] += 1
+        n = _har_seq[0]
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    return {"record_har_path": os.path.join(RECORD_DIR, f"network_{os.getpid()}_{n}.har"),
+            "record_har_content": "embed"}
+
+def install_replay_routes(context):
+    """Sert les pages enregistrées et coupe le réseau; True si le rejeu est actif"""
+    # relu à l'appel: bench_extractors définit REPLAY_DIR après l'import du module
+    replay_har = os.getenv("REPLAY_HAR", REPLAY_HAR).strip()
+    replay_dir = os.getenv("REPLAY_DIR", REPLAY_DIR).strip()
+    if replay_har:
+        context.route_from_har(replay_har, not_found="abort")
+        return True
+    if not replay_dir:
+        return False
+    index = load_index(replay_dir)
+    print(f"📼 Rejeu hors ligne: {len(index)} page(s) enregistrée(s) dans {replay_dir}")
+
+    def handle(route):
+        req = route.request
+        if req.resource_type != "document":
+            return route.abort()
+        entry = index.get(fixture_key(req.url))
+        if not entry:
+            count("fixture.replay", result="miss")
+            return route.fulfill(status=404, body="fixture absente")
+        count("fixture.replay", result="hit")
+        with open(os.path.join(replay_dir, entry["file"]), encoding="utf-8") as f:
+            body = f.read()
+        return route.fulfill(status=200, body=body,
+                             content_type="text/html; charset=utf-8",
+                             headers={"content-security-policy": "script-src 'none'"})
+
+    context.route("**/*", handle)
+    return True
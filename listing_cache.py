@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Cache disque des annonces déjà scrapées (SQLite)
+Clé: URL canonique de l'annonce, valeur: le dict retourné par parse_listing + scraped_at
+
+Table `signatures`: empreinte de la carte de recherche de chaque annonce au dernier
+run. Une annonce dont la carte n'a pas changé réutilise sa ligne en cache jusqu'à
+CACHE_FORCE_REFRESH_HOURS au lieu de CACHE_TTL_HOURS.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import datetime
+import threading
+
+CACHE_DB        = os.getenv("CACHE_DB", "").strip()          # vide = cache désactivé
+CACHE_TTL_HOURS = float(os.getenv("CACHE_TTL_HOURS", "24"))
+# Rafraîchissement forcé d'une annonce dont la carte de recherche n'a pas changé
+CACHE_FORCE_REFRESH_HOURS = float(os.getenv("CACHE_FORCE_REFRESH_HOURS", "168"))
+# Durée de vie par champ, ex: "host_overall_rating=24,license_code=168" (heures)
+CACHE_FIELD_TTL = os.getenv("CACHE_FIELD_TTL", "")
+# Champs qui, vides en cache, forcent un nouveau scraping (échec probable du run précédent)
+CACHE_RETRY_EMPTY = os.getenv("CACHE_RETRY_EMPTY", "title,host_profile_url")
+
+RE_ROOM_ID = re.compile(r"/rooms/(?:plus/)?(\d+)")
+
+_lock = threading.Lock()
+_conn = [None]
+
+def parse_field_ttl(spec):
+    out = {}
+    for part in spec.split(","):
+        if "=" in part:
+            k, v = part.split("=", 1)
+            try:
+                out[k.strip()] = float(v)
+            except ValueError:
+                continue
+    return out
+
+FIELD_TTL   = parse_field_ttl(CACHE_FIELD_TTL)
+RETRY_EMPTY = [f.strip() for f in CACHE_RETRY_EMPTY.split(",") if f.strip()]
+
+def canonical_room_url(url):
+    """https://fr.airbnb.ca/rooms/123?x=y -> https://www.airbnb.com/rooms/123"""
+    m = RE_ROOM_ID.search(url or "")
+    return f"https://www.airbnb.com/rooms/{m.group(1)}" if m else (url or "").split("?")[0]
+
+def cache_enabled():
+    return bool(CACHE_DB)
+
+def _db():
+    if _conn[0] is None:
+        conn = sqlite3.connect(CACHE_DB, check_same_thread=False)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS listings (
+                room_url   TEXT PRIMARY KEY,
+                data       TEXT NOT NULL,
+                scraped_at TEXT NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                room_url TEXT PRIMARY KEY,
+                sig      TEXT NOT NULL,
+                seen_at  TEXT NOT NULL
+            )
+        """)
+        conn.commit()
+        _conn[0] = conn
+    return _conn[0]
+
+def parse_iso(ts):
+    try:
+        dt = datetime.datetime.fromisoformat(ts)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt
+
+def age_hours(ts, now=None):
+    dt = parse_iso(ts)
+    if dt is None:
+        return float("inf")
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return (now - dt).total_seconds() / 3600
+
+def is_fresh(row, now=None, unchanged=False):
+    """
+    Applique le TTL global, les TTL par champ et la politique des champs vides.
+    `unchanged`: carte de recherche identique au run précédent, seul
+    CACHE_FORCE_REFRESH_HOURS s'applique alors (et les champs vides).
+    """
+    age = age_hours(row.get("scraped_at"), now)
+    if unchanged:
+        if age > max(CACHE_TTL_HOURS, CACHE_FORCE_REFRESH_HOURS):
+            return False
+        return all(row.get(f) for f in RETRY_EMPTY)
+    if age > CACHE_TTL_HOURS:
+        return False
+    for field, ttl in FIELD_TTL.items():
+        if row.get(field) and age > ttl:
+            return False
+    return all(row.get(f) for f in RETRY_EMPTY)
+
+def cache_get(url, unchanged=False):
+    """Retourne la ligne en cache si elle est encore fraîche, sinon None"""
+    if not cache_enabled():
+        return None
+    with _lock:
+        cur = _db().execute("SELECT data FROM listings WHERE room_url = ?",
+                            (canonical_room_url(url),))
+        hit = cur.fetchone()
+    if not hit:
+        return None
+    row = json.loads(hit[0])
+    if not is_fresh(row, unchanged=unchanged):
+        return None
+    row["url"] = url
+    return row
+
+def cache_put(row):
+    if not cache_enabled() or not row.get("url"):
+        return
+    data = {k: v for k, v in row.items() if k != "sources"}
+    with _lock:
+        db = _db()
+        db.execute("INSERT OR REPLACE INTO listings (room_url, data, scraped_at) VALUES (?, ?, ?)",
+                   (canonical_room_url(row["url"]), json.dumps(data, ensure_ascii=False),
+                    row.get("scraped_at", "")))
+        db.commit()
+
+def signatures_get(urls):
+    """{url canonique: empreinte} enregistrées pour ces annonces"""
+    if not cache_enabled():
+        return {}
+    keys = list(dict.fromkeys(canonical_room_url(u) for u in urls))
+    out = {}
+    with _lock:
+        db = _db()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            cur = db.execute(f"SELECT room_url, sig FROM signatures WHERE room_url IN ({','.join('?' * len(chunk))})",
+                             chunk)
+            out.update(cur.fetchall())
+    return out
+
+def signatures_put(sigs, seen_at):
+    """Enregistre {url: empreinte} vues à `seen_at`"""
+    if not cache_enabled() or not sigs:
+        return
+    with _lock:
+        db = _db()
+        db.executemany("INSERT OR REPLACE INTO signatures (room_url, sig, seen_at) VALUES (?, ?, ?)",
+                       [(canonical_room_url(u), sig, seen_at) for u, sig in sigs.items()])
+        db.commit()
+
+def cache_close():
+    with _lock:
+        if _conn[0] is not None:
+            _conn[0].close()
+            _conn[0] = None
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Mémoire bornée pour les longs runs (MEMORY_MODE=1)
+
+- pages/contextes recyclés toutes les RECYCLE_EVERY annonces, ou dès que le
+  process et ses navigateurs dépassent RECYCLE_RSS_MB (VmRSS de /proc)
+- le texte des pages est lu par fenêtres autour des libellés utiles
+  (TEXT_WINDOW_CHARS au plus) au lieu de body.inner_text / page.content() entiers
+- pic de RSS par étape dans le résumé run_metrics
+"""
+
+import os
+import threading
+
+from run_metrics import count, peak
+
+MEMORY_MODE = os.getenv("MEMORY_MODE", "").strip().lower() in ("1", "true", "yes")
+RECYCLE_EVERY = int(os.getenv("RECYCLE_EVERY", "40" if MEMORY_MODE else "0"))          # 0 = jamais
+RECYCLE_RSS_MB = float(os.getenv("RECYCLE_RSS_MB", "1500" if MEMORY_MODE else "0"))    # 0 = jamais
+RECYCLE_MIN_USES = 5          # pas de recyclage "rss" plus souvent que ça (évite de boucler)
+TEXT_WINDOW_CHARS = int(os.getenv("TEXT_WINDOW_CHARS", "20000"))
+
+def vm_rss_kb(pid="self"):
+    """VmRSS d'un process en Ko (0 si illisible: process terminé, pas de /proc)"""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii", errors="replace") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+def tree_rss_mb():
+    """RSS du process et de tous ses descendants (driver Playwright, Chromium, renderers)"""
+    me = os.getpid()
+    children = {}
+    try:
+        pids = [p for p in os.listdir("/proc") if p.isdigit()]
+    except OSError:
+        return vm_rss_kb() / 1024
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat", encoding="ascii", errors="replace") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(pid))
+    total, todo = 0, [me]
+    while todo:
+        pid = todo.pop()
+        total += vm_rss_kb(pid)
+        todo.extend(children.get(pid, ()))
+    return total / 1024
+
+class Recycler:
+    """Compte les annonces par page (clé: proxy) et dit quand la recycler"""
+
+    def __init__(self, every=RECYCLE_EVERY, rss_mb=RECYCLE_RSS_MB):
+        self.every = every
+        self.rss_mb = rss_mb
+        self.uses = {}
+        self.lock = threading.Lock()
+
+    @property
+    def active(self):
+        return bool(self.every or self.rss_mb)
+
+    def due(self, key):
+        """Raison du recyclage ("listings" ou "rss") après une annonce, sinon None"""
+        if not self.active:
+            return None
+        with self.lock:
+            n = self.uses[key] = self.uses.get(key, 0) + 1
+        why = None
+        if self.every and n >= self.every:
+            why = "listings"
+        elif self.rss_mb and n >= RECYCLE_MIN_USES:
+            mb = tree_rss_mb()
+            peak("process_tree", mb)
+            if mb >= self.rss_mb:
+                why = "rss"
+        if why:
+            with self.lock:
+                self.uses[key] = 0
+            count("page.recycled", reason=why)
+        return why
+
+# Fenêtres de texte autour des ancres, calculées dans la page: seul l'extrait
+# (au plus `max` caractères) traverse vers Python. Sans ancre: début du texte.
+TEXT_WINDOWS_JS = """
+([sel, needles, before, after, max]) => {
+  const el = sel ? document.querySelector(sel) : document.body;
+  const text = el ? (el.innerText || '') : '';
+  const lower = text.toLowerCase();
+  const spans = [];
+  for (const n of needles) {
+    // plafond par ancre: "•" fréquent ne doit pas évincer "depuis" ou "since"
+    let i = lower.indexOf(n.toLowerCase()), found = 0;
+    while (i >= 0 && found < 50) {
+      spans.push([Math.max(0, i - before), Math.min(text.length, i + n.length + after)]);
+      found += 1;
+      i = lower.indexOf(n.toLowerCase(), i + 1);
+    }
+  }
+  if (!spans.length) return text.slice(0, max);
+  spans.sort((a, b) => a[0] - b[0]);
+  const merged = [spans[0]];
+  for (const [s, e] of spans.slice(1)) {
+    const last = merged[merged.length - 1];
+    if (s <= last[1]) last[1] = Math.max(last[1], e); else merged.push([s, e]);
+  }
+  let out = '';
+  for (const [s, e] of merged) {
+    if (out.length >= max) break;
+    out += (out ? '\\n\\n' : '') + text.slice(s, e);
+  }
+  return out.slice(0, max);
+}
+"""
+
+# Liens de profil hôte relevés dans le HTML côté navigateur (sans rapatrier la page)
+PROFILE_HREFS_JS = """
+() => {
+  const html = document.documentElement ? document.documentElement.outerHTML : '';
+  return (html.match(/href="(?:https?:\\/\\/[^"]*?)?\\/users\\/(?:profile|show)\\/[^"?]+/g) || []).slice(0, 50);
+}
+"""
+
+# Seuls les blobs d'état JSON embarqués, réemballés pour extract_embedded_fields.
+# Même règle que load_embedded_json (sous-chaîne des attributs): id="data-deferred-state-0".
+STATE_SCRIPTS_JS = """
+(keys) => {
+  const out = [];
+  for (const s of document.querySelectorAll('script[type="application/json"]')) {
+    const attrs = s.getAttributeNames().map(a => a + '="' + (s.getAttribute(a) || '') + '"').join(' ');
+    const k = keys.find(k => attrs.includes(k));
+    if (k) out.push('<script type="application/json" ' + k + '>' + s.textContent + '</script>');
+  }
+  return out.join('\\n');
+}
+"""
+
+def text_windows(page, needles, before, after, selector=None, max_chars=TEXT_WINDOW_CHARS):
+    """Extraits du texte visible autour des `needles` (insensible à la casse)"""
+    return page.evaluate(TEXT_WINDOWS_JS, [selector, list(needles), before, after, max_chars]) or ""
+
+def profile_hrefs_html(page):
+    """Pseudo-HTML ne contenant que les attributs href de profil hôte"""
+    return " ".join(h + '"' for h in page.evaluate(PROFILE_HREFS_JS) or [])
+
+def state_scripts_html(page, ids):
+    """Pseudo-HTML ne contenant que les <script> d'état JSON embarqué"""
+    return page.evaluate(STATE_SCRIPTS_JS, list(ids)) or ""
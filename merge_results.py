@@ -2,162 +2,348 @@
 """
 Script de fusion des résultats Airbnb
 Fusionne les données des annonces (Phase 1) avec les données des hôtes (Phase 2)
+
+Fusion en flux: seuls les hôtes sont indexés (en mémoire, ou dans un SQLite
+temporaire au-delà de MERGE_HOST_INDEX_MAX entrées), les annonces sont lues
+et écrites ligne par ligne.
 """
 
 import os
 import csv
 import glob
+import json
+import codecs
+import sqlite3
+import argparse
+import tempfile
 from pathlib import Path
 
+from parquet_output import write_parquet, MERGED_TYPES
+from host_index import host_key
+from run_events import emit
+
+MERGE_HOST_INDEX_MAX = int(os.getenv("MERGE_HOST_INDEX_MAX", "500000"))
+SNIFF_BYTES = 64 * 1024
+
+OUTPUT_DIR = Path("output_final")
+PARTS_DIR = OUTPUT_DIR / "parts"
+STATE_FILE = OUTPUT_DIR / "merge_state.json"
+
+HOST_FIELDS = ['name', 'rating', 'joined_year', 'years_active', 'listing_count', 'notes']
+
+FIELDNAMES = [
+    'url_annonce',
+    'titre',
+    'licence',
+    'host_url',
+    'host_name_from_listing',
+    'host_name_detailed',
+    'host_rating_from_listing',
+    'host_rating_detailed',
+    'host_joined_from_listing',
+    'host_joined_year',
+    'host_years_active',
+    'host_listing_count',
+    'host_scrape_notes',
+    'scraped_at',
+]
+
+def sniff_encoding(filepath):
+    """Détecte l'encodage une seule fois, sur les premiers Ko du fichier"""
+    with open(filepath, 'rb') as f:
+        prefix = f.read(SNIFF_BYTES)
+    if prefix.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # Décodeur incrémental: un caractère multi-octets coupé en fin de préfixe n'est pas une erreur
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        prefix.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+def iter_csv(filepath):
+    """Lit un CSV ligne par ligne avec l'encodage détecté"""
+    try:
+        encoding = sniff_encoding(filepath)
+        with open(filepath, 'r', encoding=encoding, errors='replace', newline='') as f:
+            for row in csv.DictReader(f):
+                yield row
+    except OSError:
+        print(f"⚠️ Impossible de lire {filepath}")
+
 def read_csv_safe(filepath):
     """Lit un CSV en gérant différents encodages"""
-    encodings = ['utf-8-sig', 'utf-8', 'latin-1', 'cp1252']
-    
-    for encoding in encodings:
-        try:
-            with open(filepath, 'r', encoding=encoding, newline='') as f:
-                reader = csv.DictReader(f)
-                return list(reader)
-        except (UnicodeDecodeError, Exception):
-            continue
-    
-    print(f"⚠️ Impossible de lire {filepath}")
-    return []
+    return list(iter_csv(filepath))
+
+class HostIndex:
+    """
+    Index hôte -> champs Phase 2 (tuple compact), par identifiant numérique: les
+    liens /users/show/<id> et /users/profile/<id> d'un même hôte se rejoignent.
+    Bascule sur un SQLite temporaire quand le nombre d'hôtes dépasse `max_in_memory`.
+    """
+
+    def __init__(self, max_in_memory=MERGE_HOST_INDEX_MAX):
+        self.max_in_memory = max_in_memory
+        self.mem = {}
+        self.db = None
+        self.db_path = None
+
+    def __len__(self):
+        if self.db is None:
+            return len(self.mem)
+        return self.db.execute("SELECT COUNT(*) FROM hosts").fetchone()[0]
+
+    def _spill(self):
+        fd, self.db_path = tempfile.mkstemp(suffix=".sqlite", prefix="hosts_index_")
+        os.close(fd)
+        self.db = sqlite3.connect(self.db_path)
+        self.db.execute("PRAGMA journal_mode=OFF")
+        self.db.execute("PRAGMA synchronous=OFF")
+        self.db.execute(f"CREATE TABLE hosts (url TEXT PRIMARY KEY, {', '.join(f'{c} TEXT' for c in HOST_FIELDS)})")
+        self._insert(self.mem.items())
+        self.mem = {}
+        print(f"💾 Index des hôtes déplacé sur disque ({self.db_path})")
+
+    def _insert(self, items):
+        marks = ", ".join("?" * (len(HOST_FIELDS) + 1))
+        self.db.executemany(f"INSERT OR REPLACE INTO hosts VALUES ({marks})",
+                            ((url, *values) for url, values in items))
+
+    def add(self, url, row):
+        url = host_key(url)
+        values = tuple(row.get(k, '') or '' for k in HOST_FIELDS)
+        if self.db is not None:
+            self._insert([(url, values)])
+            return
+        self.mem[url] = values
+        if len(self.mem) > self.max_in_memory:
+            self._spill()
+
+    def get(self, url):
+        url = host_key(url)
+        if self.db is None:
+            values = self.mem.get(url)
+        else:
+            values = self.db.execute(f"SELECT {', '.join(HOST_FIELDS)} FROM hosts WHERE url = ?", (url,)).fetchone()
+        return dict(zip(HOST_FIELDS, values)) if values else None
+
+    def close(self):
+        if self.db is not None:
+            self.db.commit()
+            self.db.close()
+            os.remove(self.db_path)
+            self.db = None
+
+def build_host_index(phase2_files):
+    index = HostIndex()
+    for f in phase2_files:
+        n = 0
+        for host in iter_csv(f):
+            url = host.get('url', '').strip()
+            if url:
+                index.add(url, host)
+            n += 1
+        print(f"  - {os.path.basename(f)}: {n} hôte(s)")
+    return index
+
+def merge_row(listing, index):
+    """Retourne (ligne fusionnée, hôte trouvé ?)"""
+    # Données de base de l'annonce
+    merged_row = {
+        'url_annonce': listing.get('url', ''),
+        'titre': listing.get('title', ''),
+        'licence': listing.get('license_code', ''),
+        'host_url': listing.get('host_profile_url', ''),
+        'host_name_from_listing': listing.get('host_name', ''),
+        'host_rating_from_listing': listing.get('host_overall_rating', ''),
+        'host_joined_from_listing': listing.get('host_joined', ''),
+        'scraped_at': listing.get('scraped_at', ''),
+    }
+
+    # Chercher les infos détaillées de l'hôte
+    host_url = listing.get('host_profile_url', '').strip()
+    host_data = index.get(host_url) if host_url else None
+    if host_data:
+        merged_row.update({
+            'host_name_detailed': host_data.get('name', ''),
+            'host_rating_detailed': host_data.get('rating', ''),
+            'host_joined_year': host_data.get('joined_year', ''),
+            'host_years_active': host_data.get('years_active', ''),
+            'host_listing_count': host_data.get('listing_count', ''),
+            'host_scrape_notes': host_data.get('notes', ''),
+        })
+        return merged_row, True
+
+    # Hôte non trouvé dans Phase 2
+    merged_row.update({
+        'host_name_detailed': '',
+        'host_rating_detailed': '',
+        'host_joined_year': '',
+        'host_years_active': '',
+        'host_listing_count': '',
+        'host_scrape_notes': 'Hôte non scrapé en Phase 2',
+    })
+    return merged_row, False
+
+def merge_listing_file(path, index, writer, stats):
+    """Fusionne un fichier Phase 1 en flux; retourne les URLs d'hôtes non trouvées"""
+    unmatched = set()
+    n = 0
+    for listing in iter_csv(path):
+        row, matched = merge_row(listing, index)
+        writer.writerow(row)
+        n += 1
+        if matched:
+            stats['matched'] += 1
+            if row['host_name_detailed']:
+                stats['complete'] += 1
+        elif row['host_url'].strip():
+            unmatched.add(row['host_url'].strip())
+    stats['total'] += n
+    emit("merge.page_done", file=os.path.basename(path), rows=n, unmatched_hosts=len(unmatched))
+    print(f"  - {os.path.basename(path)}: {n} annonce(s)")
+    return unmatched
+
+def file_sig(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+def load_state():
+    try:
+        return json.loads(STATE_FILE.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+def copy_rows(src, writer_file):
+    """Recopie un CSV partiel sans son en-tête (les parties n'ont pas de BOM)"""
+    with open(src, 'r', encoding='utf-8', newline='') as f:
+        next(f, None)
+        for line in f:
+            writer_file.write(line)
 
-def merge_results():
+def merge_results(incremental=False, parquet=False):
     """Fusionne tous les résultats Phase 1 et Phase 2"""
-    
+
     print("🔗 FUSION DES RÉSULTATS")
     print("=" * 60)
-    
+
     # Créer le dossier de sortie
-    output_dir = Path("output_final")
-    output_dir.mkdir(exist_ok=True)
-    
-    # Lire tous les fichiers Phase 1 (annonces)
+    OUTPUT_DIR.mkdir(exist_ok=True)
+
     phase1_files = sorted(glob.glob("output_phase1/page_*_listings.csv"))
-    print(f"\n📄 Phase 1 : {len(phase1_files)} fichier(s) trouvé(s)")
-    
-    all_listings = []
-    for f in phase1_files:
-        data = read_csv_safe(f)
-        print(f"  - {os.path.basename(f)}: {len(data)} annonce(s)")
-        all_listings.extend(data)
-    
-    print(f"📊 Total annonces: {len(all_listings)}")
-    
-    # Lire tous les fichiers Phase 2 (hôtes)
     phase2_files = sorted(glob.glob("output_phase2/page_*_hosts.csv"))
+
+    # Indexer les hôtes (Phase 2): seule structure gardée en mémoire
     print(f"\n👥 Phase 2 : {len(phase2_files)} fichier(s) trouvé(s)")
-    
-    all_hosts = []
-    for f in phase2_files:
-        data = read_csv_safe(f)
-        print(f"  - {os.path.basename(f)}: {len(data)} hôte(s)")
-        all_hosts.extend(data)
-    
-    print(f"📊 Total hôtes: {len(all_hosts)}")
-    
-    # Créer un dictionnaire des hôtes indexé par URL
-    hosts_dict = {}
-    for host in all_hosts:
-        url = host.get('url', '').strip()
-        if url:
-            hosts_dict[url] = host
-    
-    print(f"\n🔑 Index des hôtes créé: {len(hosts_dict)} entrée(s) unique(s)")
-    
+    index = build_host_index(phase2_files)
+    print(f"\n🔑 Index des hôtes créé: {len(index)} entrée(s) unique(s)")
+
+    print(f"\n📄 Phase 1 : {len(phase1_files)} fichier(s) trouvé(s)")
+    emit("merge.started", listing_files=len(phase1_files), host_files=len(phase2_files), hosts=len(index))
+    if not phase1_files:
+        index.close()
+        print("❌ Aucune donnée à fusionner!")
+        return
+
     # Fusionner les données
     print("\n🔗 Fusion en cours...")
-    merged_data = []
-    matched_count = 0
-    
-    for listing in all_listings:
-        # Données de base de l'annonce
-        merged_row = {
-            'url_annonce': listing.get('url', ''),
-            'titre': listing.get('title', ''),
-            'licence': listing.get('license_code', ''),
-            'host_url': listing.get('host_profile_url', ''),
-            'host_name_from_listing': listing.get('host_name', ''),
-            'host_rating_from_listing': listing.get('host_overall_rating', ''),
-            'host_joined_from_listing': listing.get('host_joined', ''),
-            'scraped_at': listing.get('scraped_at', ''),
-        }
-        
-        # Chercher les infos détaillées de l'hôte
-        host_url = listing.get('host_profile_url', '').strip()
-        if host_url and host_url in hosts_dict:
-            host_data = hosts_dict[host_url]
-            merged_row.update({
-                'host_name_detailed': host_data.get('name', ''),
-                'host_rating_detailed': host_data.get('rating', ''),
-                'host_joined_year': host_data.get('joined_year', ''),
-                'host_years_active': host_data.get('years_active', ''),
-                'host_listing_count': host_data.get('listing_count', ''),
-                'host_scrape_notes': host_data.get('notes', ''),
-            })
-            matched_count += 1
-        else:
-            # Hôte non trouvé dans Phase 2
-            merged_row.update({
-                'host_name_detailed': '',
-                'host_rating_detailed': '',
-                'host_joined_year': '',
-                'host_years_active': '',
-                'host_listing_count': '',
-                'host_scrape_notes': 'Hôte non scrapé en Phase 2',
-            })
-        
-        merged_data.append(merged_row)
-    
-    print(f"✅ Fusion terminée: {matched_count}/{len(all_listings)} annonces avec données hôte complètes")
-    
-    # Écrire le fichier final
-    output_file = output_dir / "final_complete_results.csv"
-    
-    if merged_data:
-        fieldnames = [
-            'url_annonce',
-            'titre',
-            'licence',
-            'host_url',
-            'host_name_from_listing',
-            'host_name_detailed',
-            'host_rating_from_listing',
-            'host_rating_detailed',
-            'host_joined_from_listing',
-            'host_joined_year',
-            'host_years_active',
-            'host_listing_count',
-            'host_scrape_notes',
-            'scraped_at',
-        ]
-        
+    stats = {'total': 0, 'matched': 0, 'complete': 0}
+    output_file = OUTPUT_DIR / "final_complete_results.csv"
+
+    if incremental:
+        merge_incremental(phase1_files, phase2_files, index, stats, output_file)
+    else:
         with open(output_file, 'w', encoding='utf-8-sig', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
             writer.writeheader()
-            writer.writerows(merged_data)
-        
-        print(f"\n✅ Fichier final créé: {output_file}")
-        print(f"📊 Nombre total de lignes: {len(merged_data)}")
-        
-        # Statistiques
-        complete_data = sum(1 for row in merged_data if row['host_name_detailed'])
-        incomplete_data = len(merged_data) - complete_data
-        
-        print(f"\n📈 STATISTIQUES:")
-        print(f"  - Données complètes (Phase 1 + Phase 2): {complete_data}")
-        print(f"  - Données partielles (Phase 1 uniquement): {incomplete_data}")
-        
-        if incomplete_data > 0:
-            print(f"\n⚠️ {incomplete_data} annonce(s) n'ont pas de données hôte détaillées")
-            print("   (Hôtes possiblement déjà scrapés dans une page précédente ou erreurs)")
-    else:
-        print("❌ Aucune donnée à fusionner!")
-    
+            for p in phase1_files:
+                merge_listing_file(p, index, writer, stats)
+    index.close()
+
+    total = stats['total']
+    emit("merge.done", rows=total, matched=stats['matched'], complete=stats['complete'])
+    print(f"✅ Fusion terminée: {stats['matched']}/{total} annonces avec données hôte complètes")
+    print(f"\n✅ Fichier final créé: {output_file}")
+    print(f"📊 Nombre total de lignes: {total}")
+    if parquet:
+        write_parquet(lambda: iter_csv(output_file), output_file.with_suffix(".parquet"),
+                      MERGED_TYPES, "url_annonce")
+
+    # Statistiques
+    complete_data = stats['complete']
+    incomplete_data = total - complete_data
+
+    print(f"\n📈 STATISTIQUES:")
+    print(f"  - Données complètes (Phase 1 + Phase 2): {complete_data}")
+    print(f"  - Données partielles (Phase 1 uniquement): {incomplete_data}")
+
+    if incomplete_data > 0:
+        print(f"\n⚠️ {incomplete_data} annonce(s) n'ont pas de données hôte détaillées")
+        print("   (Hôtes possiblement déjà scrapés dans une page précédente ou erreurs)")
+
     print("\n" + "=" * 60)
     print("✅ FUSION TERMINÉE")
 
+def merge_incremental(phase1_files, phase2_files, index, stats, output_file):
+    """
+    Ne refusionne que les pages dont le fichier Phase 1 a changé, ou dont un hôte
+    manquant est maintenant disponible. Un fichier Phase 2 modifié (et non simplement
+    ajouté) force une refusion complète.
+    """
+    PARTS_DIR.mkdir(exist_ok=True)
+    state = load_state()
+    old_pages = state.get('pages', {})
+    old_hosts = state.get('hosts', {})
+    hosts_sig = {p: file_sig(p) for p in phase2_files}
+    full = any(p in hosts_sig and hosts_sig[p] != sig for p, sig in old_hosts.items()) \
+        or any(p not in hosts_sig for p in old_hosts)
+    if full:
+        print("♻️ Fichiers Phase 2 modifiés: refusion complète")
+
+    new_pages = {}
+    reused = 0
+    for p in phase1_files:
+        part = PARTS_DIR / (Path(p).stem + ".merged.csv")
+        prev = old_pages.get(p)
+        sig = file_sig(p)
+        if not full and prev and prev['sig'] == sig and part.exists() \
+                and not any(index.get(u) for u in prev['unmatched']):
+            new_pages[p] = prev
+            stats['total'] += prev['total']
+            stats['matched'] += prev['matched']
+            stats['complete'] += prev['complete']
+            reused += 1
+            continue
+        page_stats = {'total': 0, 'matched': 0, 'complete': 0}
+        with open(part, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            unmatched = merge_listing_file(p, index, writer, page_stats)
+        for k in stats:
+            stats[k] += page_stats[k]
+        new_pages[p] = {'sig': sig, 'unmatched': sorted(unmatched), **page_stats}
+    print(f"⏩ Incrémental: {reused} page(s) réutilisée(s), {len(phase1_files) - reused} refusionnée(s)")
+
+    with open(output_file, 'w', encoding='utf-8-sig', newline='') as out:
+        csv.DictWriter(out, fieldnames=FIELDNAMES).writeheader()
+        for p in phase1_files:
+            copy_rows(PARTS_DIR / (Path(p).stem + ".merged.csv"), out)
+
+    STATE_FILE.write_text(json.dumps({'pages': new_pages, 'hosts': hosts_sig}), encoding='utf-8')
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Fusion Phase 1 + Phase 2")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Ne refusionner que les pages modifiées depuis la dernière fusion")
+    ap.add_argument("--parquet", action="store_true",
+                    help="Écrire aussi final_complete_results.parquet (typé, dédupliqué par annonce)")
+    args = ap.parse_args(argv)
+    merge_results(incremental=args.incremental, parquet=args.parquet)
+
 if __name__ == "__main__":
-    merge_results()
+    main()
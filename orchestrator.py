@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Orchestrateur Airbnb en pipeline
+Phase 1 (annonces) → dédup des hôtes → Phase 2 (profils hôtes) → fusion
+
+- Les pages de recherche sont traitées en parallèle (--parallel)
+- La Phase 2 démarre pendant la Phase 1: les hôtes des annonces finies (journal
+  de la page) partent par lots de --host-batch, sans attendre la fin de la page
+- --shard i/N répartit search_urls.txt entre N runners (i de 1 à N)
+- --resume reprend un run interrompu grâce au journal output_work/orchestrator_journal.jsonl
+- --service garde les navigateurs de Phase 1 ouverts d'une page à l'autre
+- --python-hosts scrape les profils hôtes dans le process de Phase 1 (sans npm)
+"""
+
+import os
+import csv
+import sys
+import glob
+import time
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from run_journal import journal_append, journal_load, journal_reset, journal_follow
+from run_metrics import report as report_metrics
+from host_index import host_key, canonical_host_url, hosts_fresh, hosts_store, host_index_close
+from merge_results import iter_csv
+
+PHASE1_DIR = Path("output_phase1")
+PHASE2_DIR = Path("output_phase2")
+WORK_DIR   = Path("output_work")
+JOURNAL_FILE = WORK_DIR / "orchestrator_journal.jsonl"
+
+_print_lock = threading.Lock()
+
+def log(msg):
+    with _print_lock:
+        print(msg, flush=True)
+
+def read_search_urls(path):
+    """Lit search_urls.txt (commentaires '#' et lignes vides ignorés) -> [(numéro de page, url)]"""
+    urls = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            url = line.split("#", 1)[0].strip()
+            if url:
+                urls.append(url)
+    return list(enumerate(urls, 1))
+
+def parse_shard(spec):
+    """'2/4' -> (2, 4)"""
+    try:
+        i, n = (int(x) for x in spec.split("/", 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"--shard attend i/N, reçu: {spec}")
+    if n < 1 or not 1 <= i <= n:
+        raise argparse.ArgumentTypeError(f"--shard hors limites: {spec}")
+    return i, n
+
+def select_shard(pages, shard):
+    """Répartition round-robin: la page k va au shard ((k-1) % N) + 1"""
+    if not shard:
+        return pages
+    i, n = shard
+    return [(num, url) for num, url in pages if (num - 1) % n == i - 1]
+
+def read_host_urls(listings_csv):
+    hosts = []
+    try:
+        with open(listings_csv, encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                url = (row.get("host_profile_url") or "").split("?")[0].strip()
+                if url.startswith("https://"):
+                    hosts.append(url)
+    except FileNotFoundError:
+        pass
+    return list(dict.fromkeys(hosts))
+
+class HostDedup:
+    """
+    Hôtes déjà pris en charge pendant ce run, par identifiant numérique
+    (/users/show/ et /users/profile/ confondus). Les hôtes encore frais dans
+    l'index persistant (host_index.py) ne repartent pas en Phase 2.
+    """
+
+    def __init__(self, seed=()):
+        self.lock = threading.Lock()
+        self.seen = {host_key(u) for u in seed}
+
+    def claim(self, urls):
+        """-> (URLs canoniques à scraper, lignes Phase 2 réutilisées depuis l'index)"""
+        with self.lock:
+            new = {}
+            for u in urls:
+                k = host_key(u)
+                if k and k not in self.seen and k not in new:
+                    new[k] = canonical_host_url(u)
+            self.seen.update(new)
+        cached = hosts_fresh(list(new.values()))
+        return [u for k, u in new.items() if k not in cached], list(cached.values())
+
+def write_host_rows(path, rows):
+    fields = list(dict.fromkeys(["url"] + [k for r in rows for k in r]))
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        w.writerows(rows)
+
+def host_stage_env(args):
+    """--python-hosts: Phase 2 faite par scrape_airbnb.py, CSV hôtes écrits dans output_phase2"""
+    if not args.python_hosts:
+        return {}
+    return {"HOST_STAGE": "1", "HOSTS_DIR": str(PHASE2_DIR),
+            "HOST_CONCURRENCY": str(args.host_concurrency)}
+
+def page_journal(page_num):
+    return WORK_DIR / f"page_{page_num}_journal.jsonl"
+
+def run_phase1(page_num, url, args):
+    out_csv = PHASE1_DIR / f"page_{page_num}_listings.csv"
+    metrics_file = WORK_DIR / f"page_{page_num}_metrics.jsonl"
+    if not args.resume:
+        metrics_file.unlink(missing_ok=True)
+    env = dict(os.environ,
+               START_URL=url,
+               MAX_LISTINGS=str(args.max_listings),
+               MAX_MINUTES=str(args.max_minutes),
+               OUT_CSV=str(out_csv),
+               JOURNAL=str(page_journal(page_num)),
+               METRICS_FILE=str(metrics_file),
+               RESUME="1" if args.resume else "",
+               **host_stage_env(args))
+    log(f"1️⃣ PAGE {page_num}: Phase 1 → {url[:80]}")
+    t0 = time.time()
+    proc = subprocess.run([sys.executable, "scrape_airbnb.py"], env=env,
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    (WORK_DIR / f"page_{page_num}_phase1.log").write_text(proc.stdout or "", encoding="utf-8")
+    if proc.returncode != 0 or not out_csv.exists():
+        log(f"❌ ERREUR Phase 1 pour page {page_num} (code {proc.returncode}) - CONTINUATION")
+        return None
+    log(f"✅ Phase 1 réussie pour page {page_num} ({time.time() - t0:.0f}s)")
+    journal_append(JOURNAL_FILE, "search", str(page_num), url=url, csv=str(out_csv))
+    return out_csv
+
+def run_phase2(page_num, host_urls, part=0):
+    """Un lot Phase 2 (npm start); `part` > 0: n-ième lot de la page envoyé pendant sa Phase 1"""
+    label = f"{page_num}_lot{part}" if part else str(page_num)
+    what = f"page {page_num}, lot {part}" if part else f"page {page_num}"
+    urls_file = WORK_DIR / f"hosts_to_scrape_page_{label}.txt"
+    urls_file.write_text("\n".join(host_urls) + "\n", encoding="utf-8")
+    out_dir = WORK_DIR / f"phase2_page_{label}"
+    env = dict(os.environ, URLS_FILE=str(urls_file.resolve()), OUT_DIR=str(out_dir.resolve()))
+    log(f"2️⃣ {what.upper()}: Phase 2 ({len(host_urls)} hôtes)")
+    proc = subprocess.run(["npm", "start"], env=env,
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    (WORK_DIR / f"page_{label}_phase2.log").write_text(proc.stdout or "", encoding="utf-8")
+    results = out_dir / "results.csv"
+    if proc.returncode != 0 or not results.exists():
+        log(f"❌ ERREUR Phase 2 pour {what} - CONTINUATION")
+        return None
+    dest = PHASE2_DIR / f"page_{label}_hosts.csv"
+    dest.write_bytes(results.read_bytes())
+    hosts_store(iter_csv(dest))
+    for u in host_urls:
+        journal_append(JOURNAL_FILE, "host", u, page=page_num)
+    log(f"✅ Phase 2 réussie pour {what}")
+    return dest
+
+def phase1_done(page_num, url, done):
+    """CSV de Phase 1 déjà produit pour cette page (reprise), sinon None"""
+    prev = done.get("search", {}).get(str(page_num))
+    if prev and prev.get("url") == url and Path(prev["csv"]).exists():
+        return Path(prev["csv"])
+    return None
+
+class HostStream:
+    """
+    Hôtes d'une page envoyés en Phase 2 par lots de --host-batch au fur et à
+    mesure qu'ils arrivent; close() envoie le reste (un seul lot si --host-batch 0).
+    """
+
+    def __init__(self, page_num, args, dedup, phase2_pool, phase2_futures):
+        self.page_num = page_num
+        self.args = args
+        self.dedup = dedup
+        self.phase2_pool = phase2_pool
+        self.phase2_futures = phase2_futures
+        self.lock = threading.Lock()
+        self.pending = []
+        self.cached = []
+        self.n_urls = self.n_fresh = self.parts = 0
+
+    def add(self, urls):
+        fresh, cached = self.dedup.claim(urls)
+        with self.lock:
+            self.n_urls += len(urls)
+            self.n_fresh += len(fresh)
+            self.cached.extend(cached)
+            self.pending.extend(fresh)
+            if self.args.host_batch and len(self.pending) >= self.args.host_batch:
+                self._send(part=self.parts + 1)
+
+    def _send(self, part=0):
+        batch, self.pending = self.pending, []
+        if not batch or self.args.skip_phase2:
+            return
+        self.parts = part
+        self.phase2_futures.append(self.phase2_pool.submit(run_phase2, self.page_num, batch, part))
+
+    def close(self):
+        with self.lock:
+            self._send(part=self.parts + 1 if self.parts else 0)
+        if self.cached:
+            # Lu par la fusion comme un résultat Phase 2 ordinaire
+            write_host_rows(PHASE2_DIR / f"page_{self.page_num}_cached_hosts.csv", self.cached)
+        log(f"📊 PAGE {self.page_num}: {self.n_urls} URL(s) hôte, {self.n_fresh} à scraper "
+            f"({self.parts or 1} lot(s)), {len(self.cached)} depuis l'index")
+
+def stream_journal_hosts(journal, stream, stop):
+    """Hôtes des annonces finies, lus dans le journal de la page pendant que la Phase 1 tourne"""
+    for entry in journal_follow(journal, stop):
+        if entry.get("kind") != "listing":
+            continue
+        url = ((entry.get("row") or {}).get("host_profile_url") or "").split("?")[0].strip()
+        if url.startswith("https://"):
+            stream.add([url])
+
+def phase1_then_queue(page_num, url, args, dedup, phase2_pool, phase2_futures, done):
+    out_csv = phase1_done(page_num, url, done)
+    if out_csv:
+        log(f"⏩ PAGE {page_num}: Phase 1 déjà faite (reprise)")
+        queue_hosts(page_num, out_csv, args, dedup, phase2_pool, phase2_futures)
+        return
+    if args.python_hosts or not args.host_batch:
+        out_csv = run_phase1(page_num, url, args)
+        if out_csv:
+            queue_hosts(page_num, out_csv, args, dedup, phase2_pool, phase2_futures)
+    else:
+        journal = page_journal(page_num)
+        if not args.resume:
+            journal_reset(journal)      # pas d'entrées d'un run précédent dans le suivi
+        stream = HostStream(page_num, args, dedup, phase2_pool, phase2_futures)
+        stop = threading.Event()
+        tail = threading.Thread(target=stream_journal_hosts, args=(journal, stream, stop), daemon=True)
+        tail.start()
+        try:
+            out_csv = run_phase1(page_num, url, args)
+        finally:
+            stop.set()
+            tail.join()
+        if out_csv:
+            # Filet de sécurité: hôtes du CSV absents du journal (déjà pris: ignorés)
+            stream.add(read_host_urls(out_csv))
+        stream.close()
+    if args.delay:
+        time.sleep(args.delay)
+
+def queue_hosts(page_num, out_csv, args, dedup, phase2_pool, phase2_futures):
+    """Hôtes d'une Phase 1 terminée (reprise, mode service): un ou plusieurs lots Phase 2"""
+    if args.python_hosts:
+        log(f"👥 PAGE {page_num}: hôtes scrapés pendant la Phase 1 → {PHASE2_DIR / f'page_{page_num}_hosts.csv'}")
+        return
+    stream = HostStream(page_num, args, dedup, phase2_pool, phase2_futures)
+    stream.add(read_host_urls(out_csv))
+    stream.close()
+
+def run_service(pages, args, dedup, phase2_pool, phase2_futures, done):
+    """
+    --service: un seul process scrape_airbnb.py --serve garde --parallel navigateurs
+    chauds pour toutes les pages (pas de relance de Chromium ni de consentement
+    cookies par page). Chaque ligne DONE déclenche la Phase 2 de la page.
+    """
+    pending = []
+    for num, url in pages:
+        out_csv = phase1_done(num, url, done)
+        if out_csv:
+            log(f"⏩ PAGE {num}: Phase 1 déjà faite (reprise)")
+            queue_hosts(num, out_csv, args, dedup, phase2_pool, phase2_futures)
+        else:
+            pending.append((num, url))
+    if not pending:
+        return
+
+    metrics_file = WORK_DIR / "service_metrics.jsonl"
+    if not args.resume:
+        metrics_file.unlink(missing_ok=True)
+    env = dict(os.environ,
+               SERVICE_POOL=str(args.parallel),
+               MAX_LISTINGS=str(args.max_listings),
+               MAX_MINUTES=str(args.max_minutes),
+               JOURNAL=str(WORK_DIR / "service_journal.jsonl"),
+               METRICS_FILE=str(metrics_file),
+               RESUME="1" if args.resume else "",
+               **host_stage_env(args))
+    log(f"🔥 Mode service: {len(pending)} page(s), {args.parallel} contexte(s) chaud(s)")
+    proc = subprocess.Popen([sys.executable, "scrape_airbnb.py", "--serve"], env=env, text=True,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    def feed():
+        for num, url in pending:
+            proc.stdin.write(f"{url}\t{PHASE1_DIR / f'page_{num}_listings.csv'}\t{num}\n")
+        proc.stdin.close()
+    threading.Thread(target=feed, daemon=True).start()
+
+    urls = dict(pending)
+    n_done = 0
+    with open(WORK_DIR / "service.log", "w", encoding="utf-8") as service_log:
+        for line in proc.stdout:
+            service_log.write(line)
+            parts = line.rstrip("\n").split("\t")
+            if parts[0] == "DONE" and len(parts) >= 3 and parts[1].isdigit():
+                num, out_csv = int(parts[1]), Path(parts[2])
+                n_done += 1
+                log(f"✅ Phase 1 réussie pour page {num} ({n_done}/{len(pending)})")
+                journal_append(JOURNAL_FILE, "search", str(num), url=urls.get(num, ""), csv=str(out_csv))
+                queue_hosts(num, out_csv, args, dedup, phase2_pool, phase2_futures)
+            elif parts[0] == "FAIL" and len(parts) >= 2:
+                log(f"❌ ERREUR Phase 1 pour page {parts[1]}: {parts[-1]} - CONTINUATION")
+    proc.wait()
+    if proc.returncode != 0:
+        log(f"❌ Service Phase 1 terminé avec le code {proc.returncode}")
+
+def orchestrate(args):
+    for d in (PHASE1_DIR, PHASE2_DIR, WORK_DIR):
+        d.mkdir(exist_ok=True)
+
+    pages = select_shard(read_search_urls(args.search_urls), args.shard)
+    shard_txt = f" (shard {args.shard[0]}/{args.shard[1]})" if args.shard else ""
+    log("🚀 DÉBUT DE L'ORCHESTRATION")
+    log(f"📊 {len(pages)} page(s) à traiter{shard_txt}, {args.parallel} en parallèle")
+
+    if args.resume:
+        done = journal_load(JOURNAL_FILE)
+        log(f"⏩ Reprise: {len(done.get('search', {}))} page(s) et {len(done.get('host', {}))} hôte(s) déjà faits")
+    else:
+        done = {}
+        journal_reset(JOURNAL_FILE)
+
+    # Seuls les hôtes dont la Phase 2 a abouti comptent comme faits à la reprise
+    dedup = HostDedup(seed=done.get("host", {}))
+    phase2_futures = []
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=args.host_parallel) as phase2_pool, \
+         ThreadPoolExecutor(max_workers=args.parallel) as phase1_pool:
+        if args.service:
+            run_service(pages, args, dedup, phase2_pool, phase2_futures, done)
+        else:
+            futures = [phase1_pool.submit(phase1_then_queue, num, url, args, dedup, phase2_pool, phase2_futures, done)
+                       for num, url in pages]
+            for n_done, fut in enumerate(as_completed(futures), 1):
+                try:
+                    fut.result()
+                except Exception as e:
+                    log(f"❌ Erreur inattendue: {e}")
+                log(f"✅ {n_done}/{len(pages)} page(s) terminée(s)")
+        for fut in list(phase2_futures):
+            try:
+                fut.result()
+            except Exception as e:
+                log(f"❌ Erreur inattendue Phase 2: {e}")
+
+    host_index_close()
+    log(f"🎉 ORCHESTRATION TERMINÉE en {(time.time() - t0) / 60:.1f} min")
+    report_metrics(sorted(glob.glob(str(WORK_DIR / "*_metrics.jsonl"))))
+
+    if not args.no_merge:
+        from merge_results import merge_results
+        merge_results()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Orchestrateur Airbnb (Phase 1 → Phase 2 → fusion)")
+    ap.add_argument("--search-urls", default="search_urls.txt")
+    ap.add_argument("--parallel", type=int, default=2, help="Pages de recherche traitées en parallèle")
+    ap.add_argument("--host-parallel", type=int, default=1, help="Lots Phase 2 en parallèle")
+    ap.add_argument("--shard", type=parse_shard, default=None, help="i/N: ne traiter que le shard i sur N")
+    ap.add_argument("--max-listings", type=int, default=int(os.getenv("MAX_LISTINGS", "20")))
+    ap.add_argument("--max-minutes", type=float, default=float(os.getenv("MAX_MINUTES", "15")))
+    ap.add_argument("--delay", type=float, default=0, help="Pause (s) d'un worker après chaque page")
+    ap.add_argument("--host-batch", type=int, default=int(os.getenv("HOST_BATCH", "10")),
+                    help="Hôtes par lot Phase 2, envoyés pendant la Phase 1 (0 = un lot par page, après sa Phase 1)")
+    ap.add_argument("--skip-phase2", action="store_true")
+    ap.add_argument("--no-merge", action="store_true", help="Ne pas fusionner (runs shardés)")
+    ap.add_argument("--resume", action="store_true", help="Sauter les pages/annonces/hôtes déjà faits")
+    ap.add_argument("--service", action="store_true",
+                    help="Phase 1 dans un seul process aux navigateurs chauds (scrape_airbnb.py --serve)")
+    ap.add_argument("--python-hosts", action="store_true",
+                    help="Profils hôtes scrapés par scrape_airbnb.py dans le même navigateur (pas de npm/scraper.js)")
+    ap.add_argument("--host-concurrency", type=int, default=int(os.getenv("HOST_CONCURRENCY", "2")),
+                    help="Profils hôtes scrapés en même temps par process (--python-hosts)")
+    args = ap.parse_args(argv)
+    orchestrate(args)
+
+if __name__ == "__main__":
+    main()
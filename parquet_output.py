@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Sortie Parquet typée et dédupliquée (optionnelle, nécessite pyarrow)
+
+- Phase 1: colonnes de airbnb_results.csv
+- Fusion: colonnes de final_complete_results.csv
+Une annonce présente sur plusieurs pages de recherche n'est gardée qu'une fois:
+une ligne avec des données l'emporte sur une ligne vide ou en erreur, puis la
+ligne au scraped_at le plus récent.
+"""
+
+import datetime
+
+from listing_cache import canonical_room_url, parse_iso
+
+BATCH_ROWS = 50000
+
+# colonne -> type ("str", "float", "int", "ts")
+LISTING_TYPES = {
+    "url": "str", "title": "str", "license_code": "str",
+    "host_name": "str", "host_overall_rating": "float",
+    "host_profile_url": "str", "host_joined": "int", "scraped_at": "ts",
+}
+MERGED_TYPES = {
+    "url_annonce": "str", "titre": "str", "licence": "str", "host_url": "str",
+    "host_name_from_listing": "str", "host_name_detailed": "str",
+    "host_rating_from_listing": "float", "host_rating_detailed": "float",
+    "host_joined_from_listing": "int", "host_joined_year": "int",
+    "host_years_active": "int", "host_listing_count": "int",
+    "host_scrape_notes": "str", "scraped_at": "ts",
+}
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("❌ La sortie Parquet nécessite pyarrow: python -m pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+def to_float(v):
+    try:
+        return float(str(v).replace(",", ".")) if str(v).strip() else None
+    except ValueError:
+        return None
+
+def to_int(v):
+    f = to_float(v)
+    return int(f) if f is not None else None
+
+def to_ts(v):
+    return parse_iso(v) if v else None
+
+# Colonnes qui prouvent qu'une visite a rapporté quelque chose (Phase 1 et fusion)
+DATA_KEYS = ("title", "titre", "host_profile_url", "host_url", "host_name", "host_name_from_listing")
+
+CONVERTERS = {"str": lambda v: v if v is not None else "", "float": to_float, "int": to_int, "ts": to_ts}
+
+def arrow_schema(types):
+    pa, _ = require_pyarrow()
+    arrow = {"str": pa.string(), "float": pa.float64(), "int": pa.int32(),
+             "ts": pa.timestamp("us", tz="UTC")}
+    return pa.schema([(k, arrow[t]) for k, t in types.items()])
+
+def typed_row(row, types):
+    return {k: CONVERTERS[t](row.get(k)) for k, t in types.items()}
+
+def has_data(row):
+    return not row.get("error") and any(row.get(k) for k in DATA_KEYS)
+
+def latest_per_listing(rows_iter_factory, url_key):
+    """
+    1re passe: position de la ligne à garder pour chaque annonce. Une visite vide
+    (erreur, budget épuisé) ne remplace pas une ligne complète d'une autre page,
+    même si elle est plus récente.
+    """
+    best = {}
+    epoch = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+    for i, row in enumerate(rows_iter_factory()):
+        key = canonical_room_url(row.get(url_key, "")) or f"#{i}"
+        rank = (has_data(row), parse_iso(row.get("scraped_at")) or epoch)
+        if key not in best or rank >= best[key][0]:
+            best[key] = (rank, i)
+    return {i for _, i in best.values()}
+
+def write_parquet(rows_iter_factory, path, types, url_key):
+    """
+    Écrit `path` par lots de BATCH_ROWS lignes. `rows_iter_factory` est rappelée
+    deux fois (dédup puis écriture) pour ne jamais charger tout le fichier.
+    """
+    pa, pq = require_pyarrow()
+    keep = latest_per_listing(rows_iter_factory, url_key)
+    schema = arrow_schema(types)
+    written = 0
+    with pq.ParquetWriter(str(path), schema, compression="zstd") as writer:
+        batch = []
+        for i, row in enumerate(rows_iter_factory()):
+            if i not in keep:
+                continue
+            batch.append(typed_row(row, types))
+            if len(batch) >= BATCH_ROWS:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                written += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            written += len(batch)
+    print(f"🧱 Parquet: {written} ligne(s) unique(s) → {path}")
+    return written
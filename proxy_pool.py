@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Pool de proxies avec score de santé
+
+Liste: PROXY_LIST="http://u:p@h1:8000,http://h2:8000" ou PROXY_FILE (un par ligne).
+Sans liste, le pool est inactif et PROXY (un seul proxy au lancement) s'applique.
+
+- chaque proxy sert au plus PROXY_CONCURRENCY navigations à la fois
+- le plus sain disponible est choisi: taux d'erreur et latence (moyennes
+  glissantes), un proxy jamais essayé passe en premier
+- blocage (403/429/captcha): mise au repos PROXY_COOLDOWN_S, doublée à chaque
+  blocage consécutif; PROXY_MAX_STRIKES échecs d'affilée: proxy écarté du run
+- chaque proxy a son propre limiteur de débit adaptatif
+"""
+
+import os
+import time
+import threading
+from urllib.parse import urlsplit
+
+from run_metrics import count
+from rate_limiter import AdaptiveRateLimiter
+
+PROXY_LIST = os.getenv("PROXY_LIST", "").strip()
+PROXY_FILE = os.getenv("PROXY_FILE", "").strip()
+PROXY_CONCURRENCY = max(1, int(os.getenv("PROXY_CONCURRENCY", "1")))
+PROXY_COOLDOWN_S = float(os.getenv("PROXY_COOLDOWN_S", "300"))
+PROXY_MAX_STRIKES = int(os.getenv("PROXY_MAX_STRIKES", "5"))
+EWMA = 0.3
+
+class NoHealthyProxy(RuntimeError):
+    pass
+
+def playwright_proxy(url):
+    """'http://u:p@h:8000' -> {"server": "http://h:8000", "username": "u", "password": "p"}"""
+    if "://" not in url:
+        url = "http://" + url
+    parts = urlsplit(url)
+    proxy = {"server": f"{parts.scheme}://{parts.hostname}" + (f":{parts.port}" if parts.port else "")}
+    if parts.username:
+        proxy["username"] = parts.username
+        proxy["password"] = parts.password or ""
+    return proxy
+
+def read_proxy_urls():
+    urls = [u.strip() for u in PROXY_LIST.split(",") if u.strip()]
+    if PROXY_FILE:
+        with open(PROXY_FILE, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    urls.append(line)
+    return list(dict.fromkeys(urls))
+
+class Proxy:
+
+    def __init__(self, url):
+        self.settings = playwright_proxy(url)
+        self.label = self.settings["server"].split("://", 1)[-1]   # sans identifiants
+        self.limiter = AdaptiveRateLimiter()
+        self.in_use = 0
+        self.latency = 0.0      # s, moyenne glissante
+        self.error_rate = 0.0   # 0..1, moyenne glissante
+        self.uses = 0
+        self.strikes = 0
+        self.blocks = 0
+        self.cooldown_until = 0.0
+        self.evicted = False
+
+    def score(self):
+        return (1.0 - self.error_rate) / (1.0 + self.latency / 10.0)
+
+class ProxyPool:
+
+    def __init__(self, urls, concurrency=PROXY_CONCURRENCY):
+        self.proxies = [Proxy(u) for u in urls]
+        self.concurrency = concurrency
+        self.cond = threading.Condition()
+
+    @property
+    def active(self):
+        return bool(self.proxies)
+
+    def acquire(self):
+        """Le proxy disponible le plus sain (None si le pool est inactif); attend si tous sont pris"""
+        if not self.proxies:
+            return None
+        with self.cond:
+            while True:
+                alive = [p for p in self.proxies if not p.evicted]
+                if not alive:
+                    raise NoHealthyProxy("plus aucun proxy sain dans le pool")
+                now = time.monotonic()
+                free = [p for p in alive if p.in_use < self.concurrency and now >= p.cooldown_until]
+                if free:
+                    best = max(free, key=lambda p: (p.score(), -p.in_use))
+                    best.in_use += 1
+                    return best
+                wake = min((p.cooldown_until for p in alive if p.cooldown_until > now), default=now + 5)
+                self.cond.wait(timeout=min(max(wake - now, 0.05), 5))
+
+    def release(self, proxy, outcome, seconds=None):
+        """
+        outcome: "ok", "error", "blocked" ou None (rien appris, ex: cache)
+        seconds: durée d'une navigation (None si non représentative)
+        """
+        if proxy is None:
+            return
+        with self.cond:
+            proxy.in_use -= 1
+            if outcome:
+                self._score(proxy, outcome, seconds)
+            self.cond.notify_all()
+        if outcome:
+            count("proxy.outcome", proxy=proxy.label, outcome=outcome)
+
+    def _score(self, proxy, outcome, seconds):
+        proxy.uses += 1
+        failed = outcome != "ok"
+        proxy.error_rate = (1 - EWMA) * proxy.error_rate + EWMA * (1.0 if failed else 0.0)
+        if not failed:
+            if seconds is not None:
+                proxy.latency = seconds if not proxy.latency else (1 - EWMA) * proxy.latency + EWMA * seconds
+            proxy.strikes = proxy.blocks = 0
+            return
+        proxy.strikes += 1
+        if outcome == "blocked":
+            proxy.blocks += 1
+            pause = min(3600.0, PROXY_COOLDOWN_S * 2 ** (proxy.blocks - 1))
+            proxy.cooldown_until = time.monotonic() + pause
+            print(f"🧊 Proxy {proxy.label} bloqué: au repos {pause:.0f}s")
+        if proxy.strikes >= PROXY_MAX_STRIKES:
+            proxy.evicted = True
+            count("proxy.evicted", proxy=proxy.label)
+            print(f"🚫 Proxy {proxy.label} écarté ({proxy.strikes} échecs d'affilée)")
+
+    def report(self):
+        if not self.proxies:
+            return
+        print(f"\n🌐 PROXIES")
+        for p in sorted(self.proxies, key=lambda p: -p.score()):
+            state = "écarté" if p.evicted else ("au repos" if p.cooldown_until > time.monotonic() else "ok")
+            print(f"   {p.label:<28} score {p.score():.2f}  erreurs {p.error_rate:.0%}  "
+                  f"latence {p.latency:.1f}s  navigations {p.uses}  {state}")
+
+proxy_pool = ProxyPool(read_proxy_urls())
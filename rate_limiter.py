@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Limiteur de débit adaptatif (seau à jetons AIMD), partagé par toutes les
+navigations d'un process (recherche et annonces, tous workers confondus)
+
+Plafond: RATE_MAX (ou RATE_PER_MIN), facultatif. Sans plafond, aucun freinage
+tant qu'Airbnb répond bien; avec plafond, départ à RATE_START (défaut: la moitié
+du plafond) pour que le débit ait de la marge pour remonter.
+- réponse saine   : +RATE_STEP navigations/min (jusqu'au plafond s'il y en a un)
+- réponse lente   : débit x0.9
+- 429/403/captcha : débit x RATE_BACKOFF (jusqu'à RATE_MIN) et pause exponentielle
+                    avec jitter avant la prochaine navigation; sans débit fixé, on
+                    part du débit réellement observé sur la dernière minute
+- erreur réseau   : comme un blocage, sans toucher au débit la 1re fois
+"""
+
+import os
+import math
+import time
+import random
+import threading
+from collections import deque
+
+from run_metrics import observe, count
+
+RATE_PER_MIN = float(os.getenv("RATE_PER_MIN", "0"))    # plafond global (0 = pas de plafond)
+RATE_MIN     = float(os.getenv("RATE_MIN", "4"))
+RATE_MAX     = float(os.getenv("RATE_MAX", "0")) or RATE_PER_MIN or math.inf
+RATE_START   = float(os.getenv("RATE_START", "0"))      # 0 = moitié du plafond (sans plafond: libre)
+RATE_STEP    = float(os.getenv("RATE_STEP", "1"))
+RATE_BACKOFF = float(os.getenv("RATE_BACKOFF", "0.5"))
+RATE_BURST   = float(os.getenv("RATE_BURST", "3"))
+RATE_SLOW_S  = float(os.getenv("RATE_SLOW_S", "20"))
+PAUSE_BASE_S = float(os.getenv("RATE_PAUSE_BASE_S", "5"))
+PAUSE_MAX_S  = float(os.getenv("RATE_PAUSE_MAX_S", "120"))
+
+class AdaptiveRateLimiter:
+
+    def __init__(self, rate=RATE_START, rate_min=RATE_MIN, rate_max=RATE_MAX, burst=RATE_BURST):
+        self.rate_min = rate_min
+        self.rate_max = max(rate_max, rate_min)
+        self.rate = min(max(rate or self.rate_max / 2, self.rate_min), self.rate_max)
+        self.burst = max(1.0, burst)
+        self.recent = deque()        # horodatages des navigations de la dernière minute
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.strikes = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        if math.isinf(self.rate):
+            self.tokens = self.burst
+        else:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate / 60.0)
+        self.updated = now
+
+    def observed_rate(self, now):
+        """Navigations/min réellement servies sur la dernière minute"""
+        while self.recent and self.recent[0] < now - 60:
+            self.recent.popleft()
+        return float(len(self.recent))
+
+    def _finite_rate(self):
+        """Débit courant; sans débit fixé, celui réellement servi (point de départ d'une baisse)"""
+        return self.observed_rate(time.monotonic()) if math.isinf(self.rate) else self.rate
+
+    def acquire(self):
+        """Bloque jusqu'à ce qu'une navigation soit autorisée"""
+        t0 = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.recent.append(now)
+                    self.observed_rate(now)
+                    break
+                wait = max(self.paused_until - now, (1 - self.tokens) * 60.0 / self.rate)
+            time.sleep(min(wait, 1.0))
+        waited = (time.monotonic() - t0) * 1000
+        if waited >= 1:
+            observe("rate.wait", waited)
+
+    def report(self, outcome, seconds=0.0):
+        """outcome: "ok", "blocked" ou "error"; `seconds` = durée de la navigation"""
+        if outcome == "ok" and seconds > RATE_SLOW_S:
+            outcome = "slow"
+        count("rate.outcome", outcome=outcome)
+        with self.lock:
+            if outcome == "ok":
+                self.strikes = 0
+                self.rate = min(self.rate_max, self.rate + RATE_STEP)
+                return
+            if outcome == "slow":
+                self.rate = max(self.rate_min, self._finite_rate() * 0.9)
+                return
+            self.strikes += 1
+            if outcome == "blocked" or self.strikes > 1:
+                self.rate = max(self.rate_min, self._finite_rate() * RATE_BACKOFF)
+            # Full jitter: pause aléatoire entre 0 et base * 2^(échecs-1)
+            pause = random.uniform(0, min(PAUSE_MAX_S, PAUSE_BASE_S * 2 ** (self.strikes - 1)))
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self.tokens = min(self.tokens, 0.0)
+            rate, strikes = self.rate, self.strikes
+        print(f"🐢 {outcome} ({strikes} d'affilée): {rate:.1f} navigation(s)/min, pause {pause:.0f}s")
+
+limiter = AdaptiveRateLimiter()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Flux d'événements du run et vue en direct
+
+scrape_airbnb.py et merge_results.py émettent un événement JSON par ligne dans
+EVENTS_FILE (si défini): annonce commencée/finie, champ trouvé/manquant, hôte
+mis en file, page terminée... Plusieurs process peuvent écrire le même fichier.
+
+Vue en direct (annonces/min, ETA par rapport à MAX_MINUTES, taux de remplissage
+des champs, file restante):
+
+    python run_events.py output_work/events.jsonl              # terminal, rafraîchi
+    python run_events.py output_work/events.jsonl --http 8765  # + http://127.0.0.1:8765
+    LIVE_PORT=8765 python scrape_airbnb.py                      # endpoint dans le scraper
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EVENTS_FILE = os.getenv("EVENTS_FILE", "").strip()
+LIVE_PORT = int(os.getenv("LIVE_PORT", "0"))
+WINDOW_S = 300       # débit "récent" sur les 5 dernières minutes
+DROP_RATIO = 0.5     # alerte si le débit récent tombe sous la moitié du débit moyen
+
+_lock = threading.Lock()
+_live = [None]       # LiveStats du process si LIVE_PORT
+
+def emit(event, **fields):
+    """Ajoute un événement au flux (une seule écriture par ligne: sûr entre process)"""
+    entry = {"ts": datetime.datetime.now(datetime.timezone.utc).isoformat(), "event": event,
+             "pid": os.getpid(), **fields}
+    if _live[0] is not None:
+        _live[0].feed(entry)
+    if not EVENTS_FILE:
+        return
+    line = json.dumps(entry, ensure_ascii=False) + "\n"
+    with _lock:
+        with open(EVENTS_FILE, "a", encoding="utf-8") as f:
+            f.write(line)
+
+def epoch(entry):
+    try:
+        return datetime.datetime.fromisoformat(entry["ts"]).timestamp()
+    except (KeyError, ValueError):
+        return time.time()
+
+class LiveStats:
+    """Agrégats du flux: débit, budget, remplissage des champs, files restantes"""
+
+    def __init__(self, window_s=WINDOW_S):
+        self.window_s = window_s
+        self.lock = threading.Lock()
+        self.first = None
+        self.finished = []            # horodatages des annonces finies (hors cache)
+        self.n = {}                   # compteurs par nom d'événement
+        self.outcomes = {"ok": 0, "error": 0, "cached": 0}
+        self.fields = {}              # champ -> [trouvé, total]
+        self.deadlines = {}           # pid -> échéance (epoch) du run
+        self.running = set()
+        self.pages = []
+        self.merge = None
+
+    def add(self, key, k=1):
+        self.n[key] = self.n.get(key, 0) + k
+
+    def feed(self, e):
+        t = epoch(e)
+        ev = e.get("event", "")
+        with self.lock:
+            if self.first is None:
+                self.first = t
+            if ev == "run.started":
+                self.running.add(e.get("pid"))
+                if e.get("max_minutes"):
+                    self.deadlines[e.get("pid")] = t + float(e["max_minutes"]) * 60
+            elif ev == "run.finished":
+                self.running.discard(e.get("pid"))
+                self.deadlines.pop(e.get("pid"), None)
+            elif ev == "listing.queued":
+                self.add("listing.queued", e.get("n", 1))
+            elif ev == "listing.finished":
+                self.add("listing.finished")
+                outcome = "cached" if e.get("cached") else ("error" if e.get("error") else "ok")
+                self.outcomes[outcome] += 1
+                if outcome != "cached":
+                    self.finished.append(t)
+            elif ev == "field":
+                hit_total = self.fields.setdefault(e.get("field", "?"), [0, 0])
+                hit_total[0] += 1 if e.get("hit") else 0
+                hit_total[1] += 1
+            elif ev == "host.queued":
+                self.add("host.queued", e.get("n", 1))
+            elif ev == "page.done":
+                self.pages.append(e)
+            elif ev.startswith("merge."):
+                self.merge = e
+            else:
+                self.add(ev)
+
+    def snapshot(self, now=None):
+        now = now or time.time()
+        with self.lock:
+            elapsed_min = (now - self.first) / 60 if self.first else 0.0
+            n_done = len(self.finished)
+            recent = sum(1 for t in self.finished if t >= now - self.window_s)
+            rate = n_done / elapsed_min if elapsed_min > 0 else 0.0
+            recent_rate = recent / min(self.window_s / 60, elapsed_min) if elapsed_min > 0 else 0.0
+            backlog = max(0, self.n.get("listing.queued", 0) - self.n.get("listing.finished", 0)
+                          - self.n.get("listing.skipped", 0))
+            host_backlog = max(0, self.n.get("host.queued", 0) - self.n.get("host.finished", 0)
+                               - self.n.get("host.skipped", 0))
+            deadline = max(self.deadlines.values(), default=None)
+            minutes_left = (deadline - now) / 60 if deadline else None
+            speed = recent_rate or rate
+            eta_min = backlog / speed if speed and backlog else (0.0 if not backlog else None)
+            return {
+                "elapsed_min": round(elapsed_min, 1),
+                "listings_done": self.n.get("listing.finished", 0),
+                "outcomes": dict(self.outcomes),
+                "listings_per_min": round(rate, 2),
+                "recent_per_min": round(recent_rate, 2),
+                "throughput_drop": bool(rate and n_done >= 10 and recent_rate < rate * DROP_RATIO),
+                "backlog": backlog,
+                "hosts_backlog": host_backlog,
+                "hosts_done": self.n.get("host.finished", 0),
+                "eta_min": round(eta_min, 1) if eta_min is not None else None,
+                "budget_left_min": round(minutes_left, 1) if minutes_left is not None else None,
+                "over_budget": bool(minutes_left is not None and eta_min is not None and eta_min > minutes_left),
+                "fill": {k: round(h / t, 3) for k, (h, t) in sorted(self.fields.items()) if t},
+                "pages_done": len(self.pages),
+                "runs_active": len(self.running),
+                "merge": self.merge,
+            }
+
+def render(s):
+    """Vue texte d'un snapshot"""
+    lines = [f"📡 EN DIRECT ({time.strftime('%H:%M:%S')}) — {s['elapsed_min']} min écoulées, "
+             f"{s['runs_active']} run(s) actif(s), {s['pages_done']} page(s) terminée(s)"]
+    o = s["outcomes"]
+    lines.append(f"   annonces : {s['listings_done']} finies ({o['ok']} ok, {o['error']} erreur(s), "
+                 f"{o['cached']} cache) — reste {s['backlog']}")
+    drop = "  ⚠ CHUTE DE DÉBIT" if s["throughput_drop"] else ""
+    lines.append(f"   débit    : {s['recent_per_min']}/min sur 5 min, {s['listings_per_min']}/min en moyenne{drop}")
+    eta = f"{s['eta_min']} min" if s["eta_min"] is not None else "?"
+    budget = f"{s['budget_left_min']} min" if s["budget_left_min"] is not None else "-"
+    over = "  ⚠ la file ne tiendra pas dans le budget" if s["over_budget"] else ""
+    lines.append(f"   ETA      : {eta} pour vider la file, budget restant {budget}{over}")
+    lines.append(f"   hôtes    : {s['hosts_done']} fini(s), {s['hosts_backlog']} en file")
+    if s["fill"]:
+        lines.append("   remplissage : " + "  ".join(f"{k} {v:.0%}" for k, v in s["fill"].items()))
+    if s["merge"]:
+        m = s["merge"]
+        lines.append(f"   fusion   : {m['event']} " + " ".join(f"{k}={v}" for k, v in m.items()
+                                                           if k not in ("ts", "event", "pid")))
+    return "\n".join(lines)
+
+def serve_http(stats, port):
+    """GET / -> vue texte, GET /json -> snapshot; écoute sur 127.0.0.1 uniquement"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            snap = stats.snapshot()
+            if self.path.startswith("/json"):
+                body, ctype = json.dumps(snap, ensure_ascii=False), "application/json"
+            else:
+                body, ctype = render(snap) + "\n", "text/plain"
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", f"{ctype}; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📡 Vue en direct: http://127.0.0.1:{port}/ (JSON: /json)")
+    return server
+
+def start_live(port=LIVE_PORT):
+    """Endpoint HTTP dans le process courant, alimenté par emit()"""
+    if not port or _live[0] is not None:
+        return None
+    _live[0] = LiveStats()
+    try:
+        return serve_http(_live[0], port)
+    except OSError as e:
+        print(f"⚠ Vue en direct indisponible (port {port}): {e}")
+        return None
+
+def follow(path, stats):
+    """Lit les nouvelles lignes du fichier d'événements (le fichier peut ne pas exister encore)"""
+    pos = 0
+    while True:
+        try:
+            with open(path, encoding="utf-8", newline="") as f:
+                f.seek(pos)
+                for line in f:
+                    if not line.endswith("\n"):
+                        break            # ligne en cours d'écriture: relue au prochain tour
+                    pos += len(line.encode("utf-8"))
+                    try:
+                        stats.feed(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        yield
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Vue en direct d'un run (fichier EVENTS_FILE)")
+    ap.add_argument("events", nargs="?", default=EVENTS_FILE or "output_work/events.jsonl")
+    ap.add_argument("--interval", type=float, default=5, help="Rafraîchissement (s)")
+    ap.add_argument("--http", type=int, default=0, help="Servir aussi la vue sur ce port local")
+    ap.add_argument("--once", action="store_true", help="Afficher une fois et quitter")
+    args = ap.parse_args(argv)
+
+    stats = LiveStats()
+    if args.http:
+        serve_http(stats, args.http)
+    tty = sys.stdout.isatty()
+    for _ in follow(args.events, stats):
+        text = render(stats.snapshot())
+        print(("\033[2J\033[H" if tty and not args.once else "") + text, flush=True)
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Journal de reprise (JSONL, une ligne par tâche terminée)
+Utilisé par scrape_airbnb.py (recherches, annonces) et orchestrator.py (pages, hôtes)
+pour qu'un run interrompu reprenne là où il s'était arrêté.
+"""
+
+import os
+import json
+import datetime
+import threading
+
+_lock = threading.Lock()
+
+def now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+def journal_reset(path):
+    """Nouveau run sans reprise: on repart d'un journal vide"""
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def journal_append(path, kind, key, **extra):
+    """Ajoute une entrée et la force sur disque (survit à un kill du runner)"""
+    if not path:
+        return
+    entry = {"kind": kind, "key": key, "ts": now_iso(), **extra}
+    line = json.dumps(entry, ensure_ascii=False) + "\n"
+    with _lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+def journal_load(path):
+    """
+    Retourne {kind: {key: entry}}. La dernière entrée d'une clé l'emporte;
+    une dernière ligne tronquée (crash pendant l'écriture) est ignorée.
+    """
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            done.setdefault(entry.get("kind"), {})[entry.get("key")] = entry
+    return done
+
+def journal_follow(path, stop, poll=2.0):
+    """
+    Entrées ajoutées au journal par un autre process, au fil de l'eau, jusqu'à ce
+    que `stop` (threading.Event) soit levé; une dernière lecture suit l'arrêt.
+    """
+    pos = 0
+    while True:
+        last = stop.is_set()
+        try:
+            with open(path, encoding="utf-8", newline="") as f:
+                f.seek(pos)
+                for line in f:
+                    if not line.endswith("\n"):
+                        break            # ligne en cours d'écriture: relue au prochain tour
+                    pos += len(line.encode("utf-8"))
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        if last:
+            return
+        stop.wait(poll)
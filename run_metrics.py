@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Métriques de run: chronos par étape et compteurs
+Chaque mesure est ajoutée à METRICS_FILE (JSONL) si défini; le résumé p50/p95
+par étape est affiché en fin de run. Avec TRACK_RSS (ou MEMORY_MODE), la RSS du
+process est relevée à la fin de chaque étape et son pic figure au résumé.
+
+Agréger plusieurs fichiers (ex: toutes les pages d'une orchestration):
+    python run_metrics.py output_work/page_*_metrics.jsonl
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import threading
+import contextlib
+import datetime
+
+METRICS_FILE = os.getenv("METRICS_FILE", "").strip()
+TRACK_RSS = (os.getenv("TRACK_RSS", "").strip() or os.getenv("MEMORY_MODE", "").strip()).lower() in ("1", "true", "yes")
+
+_lock = threading.Lock()
+_timers = {}     # étape -> [ms, ...]
+_counters = {}   # (nom, tags triés) -> total
+_peaks = {}      # étape -> RSS max (Mo)
+
+def _emit(entry):
+    if not METRICS_FILE:
+        return
+    entry["ts"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    line = json.dumps(entry, ensure_ascii=False) + "\n"
+    with _lock:
+        with open(METRICS_FILE, "a", encoding="utf-8") as f:
+            f.write(line)
+
+def observe(stage, ms, **tags):
+    with _lock:
+        _timers.setdefault(stage, []).append(ms)
+    _emit({"type": "timer", "stage": stage, "ms": round(ms, 1), **tags})
+    if TRACK_RSS:
+        peak(stage)
+
+def rss_mb():
+    """VmRSS du process (Mo), sinon son maximum (ru_maxrss) hors Linux"""
+    try:
+        with open("/proc/self/status", encoding="ascii", errors="replace") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def peak(stage, mb=None):
+    """Retient la RSS (Mo) la plus haute vue à la fin de `stage` (RSS courante par défaut)"""
+    mb = rss_mb() if mb is None else mb
+    with _lock:
+        if mb <= _peaks.get(stage, 0):
+            return
+        _peaks[stage] = mb
+    _emit({"type": "rss", "stage": stage, "mb": round(mb, 1)})
+
+@contextlib.contextmanager
+def timer(stage, **tags):
+    """with timer("listing.goto"): ...  -> durée en ms, ok=False si exception"""
+    t0 = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        observe(stage, (time.perf_counter() - t0) * 1000, ok=ok, **tags)
+
+def count(name, n=1, **tags):
+    key = (name, tuple(sorted((k, str(v)) for k, v in tags.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+    _emit({"type": "counter", "name": name, "n": n, **tags})
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = (len(s) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
+
+def summary():
+    """Retourne {"timers": {étape: stats}, "counters": {"nom[tags]": total}}"""
+    with _lock:
+        timers = {k: list(v) for k, v in _timers.items()}
+        counters = dict(_counters)
+        peaks = dict(_peaks)
+    out = {"timers": {}, "counters": {}}
+    if peaks:
+        out["rss_peak_mb"] = {stage: round(mb, 1) for stage, mb in sorted(peaks.items())}
+    for stage, vals in sorted(timers.items()):
+        out["timers"][stage] = {
+            "n": len(vals), "total_s": round(sum(vals) / 1000, 2),
+            "p50_ms": round(percentile(vals, 50), 1), "p95_ms": round(percentile(vals, 95), 1),
+        }
+    for (name, tags), n in sorted(counters.items()):
+        label = name + (f"[{', '.join(f'{k}={v}' for k, v in tags)}]" if tags else "")
+        out["counters"][label] = n
+    return out
+
+def print_summary():
+    s = summary()
+    if not s["timers"] and not s["counters"] and not s.get("rss_peak_mb"):
+        return s
+    print(f"\n⏱️ MÉTRIQUES PAR ÉTAPE")
+    print(f"   {'étape':<28} {'n':>5} {'total(s)':>9} {'p50(ms)':>9} {'p95(ms)':>9}")
+    for stage, st in s["timers"].items():
+        print(f"   {stage:<28} {st['n']:>5} {st['total_s']:>9} {st['p50_ms']:>9} {st['p95_ms']:>9}")
+    if s["counters"]:
+        print(f"\n🔢 COMPTEURS")
+        for label, n in s["counters"].items():
+            print(f"   {label}: {n}")
+    if s.get("rss_peak_mb"):
+        print(f"\n🧠 PIC DE RSS PAR ÉTAPE (Mo)")
+        for stage, mb in s["rss_peak_mb"].items():
+            print(f"   {stage:<28} {mb:>9}")
+    _emit({"type": "summary", **s})
+    return s
+
+def load_files(paths):
+    """Recharge des fichiers JSONL de métriques dans les agrégats de ce process"""
+    for path in paths:
+        try:
+            f = open(path, encoding="utf-8")
+        except OSError:
+            continue
+        with f:
+            for line in f:
+                try:
+                    e = json.loads(line)
+                except ValueError:
+                    continue
+                if e.get("type") == "timer":
+                    with _lock:
+                        _timers.setdefault(e["stage"], []).append(e["ms"])
+                elif e.get("type") == "rss":
+                    with _lock:
+                        _peaks[e["stage"]] = max(_peaks.get(e["stage"], 0), e["mb"])
+                elif e.get("type") == "counter":
+                    tags = {k: v for k, v in e.items() if k not in ("type", "name", "n", "ts")}
+                    key = (e["name"], tuple(sorted((k, str(v)) for k, v in tags.items())))
+                    with _lock:
+                        _counters[key] = _counters.get(key, 0) + e.get("n", 1)
+
+def report(paths):
+    global METRICS_FILE
+    METRICS_FILE = ""
+    load_files(paths)
+    return print_summary()
+
+if __name__ == "__main__":
+    report([p for arg in sys.argv[1:] for p in sorted(glob.glob(arg))])
@@ -1,35 +1,176 @@
 # scrape_airbnb.py - VERSION FINALE CORRIGÉE
-import os, csv, re, time, datetime
-from urllib.parse import urljoin
+import os, sys, csv, re, time, datetime, threading, queue, json, base64, hashlib
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
 from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
+from listing_cache import (cache_get, cache_put, cache_close, cache_enabled, age_hours,
+                           canonical_room_url, signatures_get, signatures_put)
+from run_journal import journal_append, journal_load, journal_reset
+from parquet_output import write_parquet, LISTING_TYPES
+from run_metrics import timer, count, print_summary
+from run_events import emit, start_live
+import selector_memory
+from html_fixtures import record_page, context_options, install_replay_routes
+from rate_limiter import limiter
+from proxy_pool import proxy_pool, NoHealthyProxy
+from text_extract import (license_from_text, has_label, host_stats_from_text, profile_hrefs,
+                          LABELS, LICENSE_WINDOW, NEAR, RATING_FORMS, JOINED_FORM)
+from memory_guard import (MEMORY_MODE, TEXT_WINDOW_CHARS, Recycler, text_windows,
+                          profile_hrefs_html, state_scripts_html)
+from host_profiles import HOST_STAGE, HostStage, host_profile_row
+from host_index import host_index_close
 
 START_URL   = os.getenv("START_URL", "https://www.airbnb.com/s/Dubai/homes")
 MAX_LIST    = int(os.getenv("MAX_LISTINGS", "20"))
 MAX_MINUTES = float(os.getenv("MAX_MINUTES", "5"))
 PROXY       = os.getenv("PROXY", "").strip() or None
-OUT_CSV     = "airbnb_results.csv"
+LOCALE      = "fr-FR"
+OUT_CSV     = os.getenv("OUT_CSV", "airbnb_results.csv")
+WORKERS     = max(1, int(os.getenv("WORKERS", "1")))
+LISTING_RETRIES = int(os.getenv("LISTING_RETRIES", "2"))  # remises en fin de file d'une annonce en échec
+SEARCH_RETRIES = max(1, int(os.getenv("SEARCH_RETRIES", "3")))
+JOURNAL     = os.getenv("JOURNAL", "").strip() or OUT_CSV + ".journal.jsonl"
+SERVICE_MODE = "--serve" in sys.argv or os.getenv("SERVICE_MODE", "").strip().lower() in ("1", "true", "yes")
+SERVICE_POOL = max(1, int(os.getenv("SERVICE_POOL", "2")))
+STATE_DIR   = os.getenv("STATE_DIR", "browser_state")
+MAX_CTX_FAILURES = int(os.getenv("MAX_CTX_FAILURES", "3"))
+RESUME      = "--resume" in sys.argv or os.getenv("RESUME", "").strip().lower() in ("1", "true", "yes")
+PARQUET     = os.getenv("PARQUET", "").strip().lower() in ("1", "true", "yes")
+
+def env_list(name, default=""):
+    return [x.strip() for x in os.getenv(name, default).split(",") if x.strip()]
+
+# Profil "lean": on ne lit que og:title, le bloc hôte, la licence et les liens profil
+LEAN_MODE      = os.getenv("LEAN_MODE", "").strip().lower() in ("1", "true", "yes")
+BLOCK_TYPES    = set(env_list("BLOCK_TYPES", "image,media,font"))
+BLOCK_PATTERNS = env_list("BLOCK_PATTERNS",
+                          "google-analytics.com,googletagmanager.com,doubleclick.net,"
+                          "facebook.net,/tracking/,/logging/,maps.googleapis.com,maps.gstatic.com")
+ALLOW_PATTERNS = env_list("ALLOW_PATTERNS")
+
+# Collecte des annonces: "scroll" (DOM) ou "api" (réponses JSON de recherche + pagination)
+HARVEST_MODE   = os.getenv("HARVEST_MODE", "scroll").strip().lower()
+SEARCH_API_PATTERNS = env_list("SEARCH_API_PATTERNS", "/api/v3/StaysSearch,/api/v3/ExploreSearch")
+
+# Ne rescraper que les annonces dont la carte de recherche a changé (nécessite CACHE_DB)
+CHANGE_DETECTION = os.getenv("CHANGE_DETECTION", "1").strip().lower() not in ("0", "false", "no")
+
+# Extraction depuis le JSON embarqué de la page (les stratégies DOM restent en secours)
+EMBEDDED_JSON  = os.getenv("EMBEDDED_JSON", "1").strip().lower() not in ("0", "false", "no")
+
+# Mode lot: toutes les recherches d'un fichier, une seule file d'annonces dédupliquée
+BATCH_MODE     = "--batch" in sys.argv or bool(os.getenv("BATCH_FILE", "").strip())
+BATCH_FILE     = os.getenv("BATCH_FILE", "").strip() or "search_urls.txt"
+BATCH_MINUTES  = float(os.getenv("BATCH_MINUTES", "60"))                # budget global du lot
+MARKET_QUOTA   = int(os.getenv("MARKET_QUOTA", "0")) or MAX_LIST          # annonces max par recherche
 
 # ---------------- utils ----------------
 
 def now_iso():
     return datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc).isoformat()
 
-def write_csv(rows, path=OUT_CSV):
+def write_csv(rows, path=OUT_CSV, extra=()):
     header = [
         "url","title","license_code",
         "host_name","host_overall_rating","host_profile_url","host_joined","scraped_at"
-    ]
+    ] + list(extra)
     with open(path, "w", newline="", encoding="utf-8-sig") as f:
         w = csv.DictWriter(f, fieldnames=header)
         w.writeheader()
         for r in rows:
             w.writerow({k: r.get(k, "") for k in header})
 
-def click_if_present(page, selector, timeout=3000):
+def empty_row(url):
+    return {
+        "url": url, "title": "", "license_code": "",
+        "host_name": "", "host_overall_rating": "",
+        "host_profile_url": "", "host_joined": "", "scraped_at": now_iso()
+    }
+
+# ---------------- navigation limitée ----------------
+
+BLOCK_STATUSES = (403, 429)
+BLOCK_URL_MARKERS = ("captcha", "/challenge", "/blocked")
+
+_context_limiters = {}   # id(contexte) -> limiteur de son proxy
+
+class BlockedPage(Exception):
+    pass
+
+def limiter_for(page):
+    """Limiteur du proxy de la page, sinon le limiteur partagé du process"""
+    return _context_limiters.get(id(page.context), limiter)
+
+def navigate(page, url, timeout=60000):
+    """
+    page.goto derrière le limiteur adaptatif (partagé, ou celui du proxy). Chaque
+    réponse lui est signalée (saine, lente, bloquée, erreur); une page de
+    blocage lève BlockedPage.
+    """
+    limiter = limiter_for(page)
+    limiter.acquire()
+    t0 = time.time()
+    try:
+        resp = page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+    except Exception:
+        limiter.report("error")
+        raise
+    status = resp.status if resp else 0
+    if status in BLOCK_STATUSES or any(m in page.url.lower() for m in BLOCK_URL_MARKERS):
+        limiter.report("blocked")
+        count("blocked", status=status)
+        raise BlockedPage(f"page de blocage (HTTP {status}) pour {url[:80]}")
+    limiter.report("error" if status >= 500 else "ok", time.time() - t0)
+    return resp
+
+COOKIE_BUTTONS = [
+    'button:has-text("Accepter")',
+    'button:has-text("I agree")',
+    'button:has-text("OK")',
+    'button:has-text("Accept")',
+]
+READ_MORE_BUTTONS = [
+    'button:has-text("Lire la suite")',
+    'span:has-text("Lire la suite")',
+    'button:has-text("Afficher plus")',
+    'button:has-text("Read more")',
+]
+# Présence du bloc hôte (ou d'un lien profil) dans le DOM
+HOST_SIGNAL = ('a[href*="/users/profile/"], a[href*="/users/show/"], '
+               'div[data-section-id*="HOST"], div[data-plugin-in-point-id*="HOST"]')
+
+def click_first(page, kind, candidates, timeout=3000):
+    """
+    Attend le premier candidat visible en UNE seule attente (au lieu d'un timeout
+    par sélecteur), le clique, et le mémorise pour ce domaine/locale afin de
+    l'essayer en premier la prochaine fois. Retourne le sélecteur cliqué ou "".
+    """
+    key = selector_memory.memory_key(page, LOCALE)
+    cands = selector_memory.ordered(kind, key, candidates)
+    try:
+        page.locator(", ".join(cands)).filter(visible=True).first.wait_for(state="visible", timeout=timeout)
+    except PWTimeout:
+        count("timeouts", where=kind)
+        return ""
+    except Exception:
+        return ""
+    for sel in cands:
+        try:
+            el = page.locator(sel).filter(visible=True).first
+            if el.count():
+                el.click()
+                selector_memory.remember(kind, key, sel)
+                count("selector", kind=kind, selector=sel[:40])
+                return sel
+        except Exception:
+            continue
+    return ""
+
+def scroll_until(page, selector, steps=6, step_px=1400, poll_ms=250):
+    """Scrolle par pas de `step_px` jusqu'à ce que `selector` existe, au plus `steps` pas"""
     try:
-        el = page.locator(selector).first
-        el.wait_for(state="visible", timeout=timeout)
-        el.click()
+        page.wait_for_function(
+            "([sel, px]) => { if (document.querySelector(sel)) return true; window.scrollBy(0, px); return false; }",
+            arg=[selector, step_px], polling=poll_ms, timeout=steps * poll_ms + 200)
         return True
     except Exception:
         return False
@@ -40,91 +181,371 @@ def get_text_safe(loc, timeout=2500):
     except Exception:
         return ""
 
+# ---------------- profil lean ----------------
+
+_lean_stats = {}
+
+def install_byte_counter(context):
+    """Compte les requêtes bloquées et les octets reçus (content-length) du contexte"""
+    stats = {"blocked": 0, "bytes": 0, "by_type": {}}
+
+    def on_response(resp):
+        try:
+            stats["bytes"] += int(resp.headers.get("content-length") or 0)
+        except Exception:
+            pass
+
+    context.on("response", on_response)
+    _lean_stats[id(context)] = stats
+    return stats
+
+def install_lean_routes(context):
+    """Bloque les requêtes inutiles (type ou motif d'URL)"""
+    stats = _lean_stats.get(id(context)) or install_byte_counter(context)
+
+    def handle(route):
+        req = route.request
+        url = req.url
+        if not any(p in url for p in ALLOW_PATTERNS) and \
+           (req.resource_type in BLOCK_TYPES or any(p in url for p in BLOCK_PATTERNS)):
+            stats["blocked"] += 1
+            stats["by_type"][req.resource_type] = stats["by_type"].get(req.resource_type, 0) + 1
+            return route.abort()
+        return route.continue_()
+
+    context.route("**/*", handle)
+    return stats
+
+def lean_snapshot(page):
+    stats = _lean_stats.get(id(page.context))
+    return (time.time(), dict(stats) if stats else None)
+
+def lean_report(page, snap, label=""):
+    t0, before = snap
+    stats = _lean_stats.get(id(page.context))
+    if not stats or before is None:
+        return
+    blocked = stats["blocked"] - before["blocked"]
+    kb = (stats["bytes"] - before["bytes"]) / 1024
+    count("bytes_kb", round(kb), page=label or "autre")
+    if blocked:
+        count("blocked_requests", blocked, page=label or "autre")
+    if not LEAN_MODE:
+        return
+    print(f"🪶 Lean{(' ' + label) if label else ''}: {blocked} requête(s) bloquée(s), "
+          f"{kb:.0f} Ko reçus, chargement {time.time() - t0:.1f}s")
+
 # ---------------- navigation ----------------
 
-def goto_search_with_retry(page):
+def goto_search_with_retry(page, url=None, accept_cookies=True):
     """
     Gère tous les domaines Airbnb (com, fr, ca, etc.)
+    Jusqu'à SEARCH_RETRIES essais, espacés par le limiteur (pause avec jitter
+    après un échec) au lieu de rechargements immédiats.
     """
-    candidates = [START_URL]
-    
+    url = url or START_URL
     last_err = None
-    for url in candidates:
-        for _ in range(2):
-            try:
-                page.goto(url, wait_until="domcontentloaded", timeout=60000)
-                # Gestion des cookies
-                click_if_present(page, 'button:has-text("Accepter")', 4000) or \
-                click_if_present(page, 'button:has-text("I agree")', 4000) or \
-                click_if_present(page, 'button:has-text("OK")', 4000) or \
-                click_if_present(page, 'button:has-text("Accept")', 4000)
-                # Attend qu'au moins une carte soit chargée
+    for attempt in range(SEARCH_RETRIES):
+        if attempt:
+            count("search.retry")
+        navigated = False
+        try:
+            snap = lean_snapshot(page)
+            with timer("search.goto"):
+                navigate(page, url)
+            navigated = True
+            # Gestion des cookies
+            if accept_cookies:
+                with timer("search.cookies"):
+                    click_first(page, "cookie", COOKIE_BUTTONS, 4000)
+            # Attend qu'au moins une carte soit chargée
+            with timer("search.wait_cards"):
                 page.wait_for_selector('a[href^="/rooms/"]', timeout=30000)
-                print(f"✓ Navigation réussie vers {url[:80]}...")
-                return
-            except Exception as e:
-                last_err = e
-                try:
-                    page.reload(wait_until="domcontentloaded", timeout=30000)
-                except Exception:
-                    pass
+            lean_report(page, snap, "recherche")
+            print(f"✓ Navigation réussie vers {url[:80]}...")
+            return
+        except Exception as e:
+            last_err = e
+            count("search.error", kind=type(e).__name__)
+            if navigated:
+                # Page chargée mais sans cartes: souvent un blocage déguisé
+                limiter_for(page).report("error")
     raise last_err if last_err else RuntimeError("navigation failed")
 
 # ---------------- collecte URLs ----------------
 
-def collect_listing_urls(page, max_items, max_minutes):
-    goto_search_with_retry(page)
+# Champs stables d'une carte: titre, prix (par nuit si affiché), note, nombre d'avis,
+# identifiant de la 1re photo. Pas le texte entier: dates suggérées et badges
+# changent d'une nuit à l'autre sans que l'annonce change.
+CARDS_JS = """els => els.map(a => {
+    const card = a.closest('[itemprop="itemListElement"]') || a.closest('[data-testid="card-container"]')
+                 || a.parentElement || a;
+    const text = (card.innerText || '').replace(/\\s+/g, ' ').trim();
+    const titleEl = card.querySelector('[data-testid="listing-card-title"], [id^="title_"]');
+    const title = titleEl ? titleEl.textContent.trim() : (a.getAttribute('aria-label') || '');
+    const priceRow = card.querySelector('[data-testid="price-availability-row"]');
+    const priceText = priceRow ? priceRow.textContent.replace(/\\s+/g, ' ') : text;
+    const money = /(?:[€$£¥₹]|AED|CHF)\\s?\\d[\\d\\s.,]*|\\d[\\d\\s.,]*\\s?(?:[€$£¥₹]|AED|CHF)/g;
+    const nightly = priceText.match(/((?:[€$£¥₹]|AED|CHF)\\s?\\d[\\d\\s.,]*|\\d[\\d\\s.,]*\\s?(?:[€$£¥₹]|AED|CHF))\\s*(?:\\/|par|per)?\\s*(?:nuit|night)/i);
+    const price = nightly ? nightly[1] : ((priceText.match(money) || [''])[0]);
+    const rated = text.match(/(\\d[.,]\\d{1,2})\\s*\\((\\d[\\d\\s.,]*)\\)/);
+    const img = card.querySelector('img');
+    const photo = img ? (img.getAttribute('src') || '').split('?')[0].split('/').pop() : '';
+    return [a.getAttribute('href'), title, price.replace(/\\s+/g, ''),
+            rated ? rated[1].replace(',', '.') : '', rated ? rated[2].replace(/\\D/g, '') : '', photo];
+})"""
+
+def room_cards(page):
+    """[(href, titre, prix, note, avis, photo)] en un seul aller-retour"""
+    try:
+        return page.eval_on_selector_all('a[href^="/rooms/"]', CARDS_JS)
+    except Exception:
+        return []
+
+def room_hrefs(page):
+    """Tous les href de cartes en un seul aller-retour (au lieu d'un get_attribute par lien)"""
+    try:
+        return page.eval_on_selector_all('a[href^="/rooms/"]', "els => els.map(e => e.getAttribute('href'))")
+    except Exception:
+        return []
+
+def signature(*parts):
+    return hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+
+def add_card_signatures(page, cards, seen, sigs):
+    """Empreinte (titre, prix, note, avis, photo) de chaque carte retenue"""
+    for href, *fields in cards:
+        if not href:
+            continue
+        full = urljoin(page.url, href.split("?")[0])
+        if full in seen and full not in sigs:
+            sigs[full] = signature(*fields)
+
+def add_room_hrefs(page, hrefs, seen, max_items):
+    for href in hrefs:
+        if not href or "experiences" in href:
+            continue
+        full = urljoin(page.url, href.split("?")[0])
+        if "/rooms/" in full:
+            seen[full] = True
+            if len(seen) >= max_items:
+                break
+
+def print_found(urls):
+    print(f"FOUND_URLS {len(urls)}")
+    for i,u in enumerate(urls,1):
+        print(f"#{i} {u}")
+
+def collect_listing_urls(page, max_items, max_minutes, start_url=None, accept_cookies=True, sigs=None):
+    """URLs d'annonces de la recherche; `sigs` reçoit {url: empreinte de la carte}"""
+    if HARVEST_MODE == "api":
+        return collect_listing_urls_api(page, max_items, max_minutes, start_url, accept_cookies, sigs)
+
+    goto_search_with_retry(page, start_url, accept_cookies)
 
     start = time.time()
-    seen = set()
+    seen = {}
     last_h = 0
 
     while len(seen) < max_items and (time.time() - start) < (max_minutes * 60):
-        for a in page.locator('a[href^="/rooms/"]').all():
+        if sigs is None:
+            add_room_hrefs(page, room_hrefs(page), seen, max_items)
+        else:
+            cards = room_cards(page)
+            add_room_hrefs(page, [c[0] for c in cards], seen, max_items)
+            add_card_signatures(page, cards, seen, sigs)
+
+        with timer("search.scroll"):
+            page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
+            # Attend la croissance réelle de la page plutôt qu'un délai fixe
             try:
-                href = a.get_attribute("href") or ""
-                if not href or "experiences" in href:
-                    continue
-                full = urljoin(page.url, href.split("?")[0])
-                if "/rooms/" in full:
-                    seen.add(full)
-                    if len(seen) >= max_items:
-                        break
+                page.wait_for_function("h => document.body.scrollHeight > h", arg=last_h, timeout=2000)
             except Exception:
-                continue
-
-        page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
-        page.wait_for_timeout(700)
-        h = page.evaluate("document.body.scrollHeight")
+                pass
+            h = page.evaluate("document.body.scrollHeight")
         if h == last_h:
             break
         last_h = h
 
+    record_page(page, start_url or START_URL, "search")
     urls = list(seen)[:max_items]
-    print(f"FOUND_URLS {len(urls)}")
-    for i,u in enumerate(urls,1):
-        print(f"#{i} {u}")
+    print_found(urls)
+    return urls
+
+# ---------------- collecte via API de recherche ----------------
+
+# Champs d'un résultat de recherche qui entrent dans son empreinte (+ prix par nuit)
+SIGNATURE_KEYS = ("title", "name", "avgRatingLocalized", "avgRatingA11yLabel", "reviewsCount")
+RE_NIGHTLY = re.compile(r"\b(?:night|nuit)\b", re.I)   # "par nuit", pas "pour 5 nuits"
+
+def nightly_price(result, listing):
+    """
+    Prix affiché par nuit, comme la carte en mode scroll: pas les totaux ni les
+    dates suggérées de structuredDisplayPrice/pricingQuote, qui changent chaque nuit.
+    """
+    quote = result.get("pricingQuote") if isinstance(result.get("pricingQuote"), dict) else {}
+    lines = []
+    for d in (result.get("structuredDisplayPrice"), quote.get("structuredStayDisplayPrice"),
+              listing.get("structuredDisplayPrice")):
+        if isinstance(d, dict):
+            lines += [d[k] for k in ("primaryLine", "secondaryLine") if isinstance(d.get(k), dict)]
+    for line in lines:
+        label = f"{line.get('qualifier') or ''} {line.get('accessibilityLabel') or ''}"
+        if RE_NIGHTLY.search(label):
+            return str(line.get("discountedPrice") or line.get("price") or "")
+    rate = quote.get("rate")
+    if isinstance(rate, dict) and rate.get("amount"):
+        return f"{rate['amount']} {rate.get('currency') or ''}".strip()
+    return str(lines[0].get("discountedPrice") or lines[0].get("price") or "") if lines else ""
+
+def json_card_signature(result, listing):
+    picked = {k: result.get(k, listing.get(k)) for k in SIGNATURE_KEYS}
+    picked["price"] = nightly_price(result, listing)
+    pics = listing.get("contextualPictures") or result.get("contextualPictures") or []
+    photo = pics[0].get("picture", "") if pics and isinstance(pics[0], dict) else ""
+    return signature(json.dumps(picked, sort_keys=True, ensure_ascii=False), str(photo).split("?")[0])
+
+def rooms_from_search_json(blob, sigs=None):
+    """
+    Retourne (ids d'annonces, curseur de la page suivante) d'une réponse de recherche.
+    `sigs` reçoit {id: empreinte du résultat}.
+    """
+    ids, cursor = [], ""
+    for d in walk_json(blob):
+        for key in ("listing", "demandStayListing"):
+            sub = d.get(key)
+            if isinstance(sub, dict) and sub.get("id"):
+                rid = decode_gql_id(sub["id"])
+                if rid:
+                    ids.append(rid)
+                    if sigs is not None and rid not in sigs:
+                        sigs[rid] = json_card_signature(d, sub)
+        if d.get("listingId"):
+            rid = decode_gql_id(d["listingId"])
+            if rid:
+                ids.append(rid)
+        pi = d.get("paginationInfo")
+        if isinstance(pi, dict) and pi.get("nextPageCursor") and not cursor:
+            cursor = pi["nextPageCursor"]
+    return ids, cursor
+
+def with_cursor(url, cursor):
+    parts = urlsplit(url)
+    qs = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in ("cursor", "items_offset")]
+    qs.append(("cursor", cursor))
+    return urlunsplit(parts._replace(query=urlencode(qs)))
+
+def collect_listing_urls_api(page, max_items, max_minutes, start_url=None, accept_cookies=True, sigs=None):
+    """
+    Lit les ids d'annonces directement dans le JSON (état SSR de la 1re page puis
+    réponses XHR StaysSearch) et suit nextPageCursor jusqu'à max_items.
+    """
+    base_url = start_url or START_URL
+    responses = []
+
+    def on_response(resp):
+        if any(p in resp.url for p in SEARCH_API_PATTERNS):
+            responses.append(resp)
+
+    page.on("response", on_response)
+    start = time.time()
+    seen = {}
+    url, n_page = base_url, 0
+    try:
+        while len(seen) < max_items and (time.time() - start) < (max_minutes * 60):
+            try:
+                goto_search_with_retry(page, url, accept_cookies=(accept_cookies and n_page == 0))
+            except Exception as e:
+                if n_page == 0:
+                    raise
+                # Pages suivantes: on garde les annonces déjà collectées
+                count("search.api_page_error", kind=type(e).__name__)
+                print(f"⚠ Page de résultats {n_page + 1} en échec ({e}): arrêt avec {len(seen)} annonce(s)")
+                break
+            n_page += 1
+            try:
+                with timer("search.api_idle"):
+                    page.wait_for_load_state("networkidle", timeout=10000)
+            except Exception:
+                count("timeouts", where="search.api_idle")
+            record_page(page, url, "search")
+
+            blobs = []
+            try:
+                blobs.extend(load_embedded_json(page.content()))
+            except Exception:
+                pass
+            while responses:
+                resp = responses.pop(0)
+                try:
+                    blobs.append(resp.json())
+                except Exception:
+                    continue
+
+            cursor = ""
+            before = len(seen)
+            id_sigs = {}
+            for blob in blobs:
+                ids, cur = rooms_from_search_json(blob, id_sigs)
+                for rid in ids:
+                    full = urljoin(page.url, f"/rooms/{rid}")
+                    seen[full] = True
+                    if sigs is not None and rid in id_sigs:
+                        sigs.setdefault(full, id_sigs[rid])
+                cursor = cursor or cur
+            # Secours: les cartes déjà rendues
+            if sigs is None:
+                add_room_hrefs(page, room_hrefs(page), seen, max_items)
+            else:
+                cards = room_cards(page)
+                add_room_hrefs(page, [c[0] for c in cards], seen, max_items)
+                add_card_signatures(page, cards, seen, sigs)
+            print(f"📄 Page de résultats {n_page}: +{len(seen) - before} annonce(s) (total {len(seen)})")
+            count("search.api_pages")
+
+            if not cursor or len(seen) == before:
+                break
+            url = with_cursor(base_url, cursor)
+    finally:
+        page.remove_listener("response", on_response)
+
+    urls = list(seen)[:max_items]
+    print_found(urls)
     return urls
 
 # ---------------- LICENSE ----------------
 
-RE_LICENSES = [
-    re.compile(r"\b[A-Z]{3}-[A-Z]{3}-[A-Z0-9]{4,6}\b"),
-    re.compile(r"\b\d{5,8}\b"),
-    re.compile(r"\b[A-Z0-9]{5,}\b"),
-]
-LABEL_PATTERNS = [
-    "Infos d'enregistrement","Détails de l'enregistrement",
-    "Registration details","License","Licence","Permit"
-]
+# Ancres de la note et de l'année d'inscription (fenêtres de texte en MEMORY_MODE)
+HOST_STAT_NEEDLES = [n for needles, _, _ in RATING_FORMS + [JOINED_FORM] for n in needles]
+
+def body_text(page, needles, before, after, timeout=3000):
+    """
+    Texte de la page pour les extracteurs: body.inner_text entier, ou en
+    MEMORY_MODE seulement les fenêtres autour des `needles`
+    """
+    if not MEMORY_MODE:
+        return get_text_safe(page.locator("body"), timeout=timeout)
+    try:
+        with timer("text.windows"):
+            return text_windows(page, needles, before, after)
+    except Exception:
+        return ""
+
+def page_html(page, need="all"):
+    """
+    HTML pour les extracteurs regex: page.content() entier, ou en MEMORY_MODE
+    seulement les blobs JSON d'état (need="state") ou les liens de profil (need="profiles")
+    """
+    if not MEMORY_MODE or need == "all":
+        return page.content()
+    if need == "state":
+        return state_scripts_html(page, EMBEDDED_SCRIPT_IDS)
+    return profile_hrefs_html(page)
 
 def extract_license_code(page):
-    opened = (
-        click_if_present(page, 'button:has-text("Lire la suite")') or
-        click_if_present(page, 'span:has-text("Lire la suite")') or
-        click_if_present(page, 'button:has-text("Afficher plus")') or
-        click_if_present(page, 'button:has-text("Read more")')
-    )
+    with timer("license.read_more"):
+        opened = bool(click_first(page, "read_more", READ_MORE_BUTTONS, 3000))
+    count("license.read_more", opened=opened)
     text_scope = ""
     if opened:
         try:
@@ -134,59 +555,233 @@ def extract_license_code(page):
         except Exception:
             pass
     if not text_scope:
-        text_scope = get_text_safe(page.locator("body"), timeout=6000)
+        text_scope = body_text(page, LABELS, 0, LICENSE_WINDOW, timeout=6000)
+    return license_from_text(text_scope)
 
-    if any(lbl in text_scope for lbl in LABEL_PATTERNS):
-        for lbl in LABEL_PATTERNS:
-            i = text_scope.find(lbl)
-            if i >= 0:
-                text_scope = text_scope[i:i+800]
-                break
+# ---------------- JSON EMBARQUÉ ----------------
 
-    for rx in RE_LICENSES:
-        m = rx.search(text_scope)
-        if m:
-            return m.group(0)
-    return ""
+RE_JSON_SCRIPT = re.compile(r"<script([^>]*)>(.*?)</script>", re.S)
+RE_USER_PATH   = re.compile(r"/users/(?:profile|show)/\d+")
+EMBEDDED_SCRIPT_IDS = ("data-deferred-state", "data-injector-instances", "__NEXT_DATA__")
+NEXT_DATA_IDS = ("__NEXT_DATA__",)   # profils hôtes: seul blob lu par scraper.js
+
+def load_embedded_json(html, ids=EMBEDDED_SCRIPT_IDS):
+    """Retourne les blobs JSON d'état embarqués dans la PDP (niobeMinimalClientData & co)"""
+    blobs = []
+    for attrs, body in RE_JSON_SCRIPT.findall(html):
+        if "application/json" not in attrs or not any(k in attrs for k in ids):
+            continue
+        try:
+            blobs.append(json.loads(body))
+        except ValueError:
+            continue
+    return blobs
+
+def walk_json(obj):
+    """Parcours itératif (ordre du document) de tous les dicts d'un blob JSON"""
+    stack = [obj]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, dict):
+            yield cur
+            stack.extend(reversed([v for v in cur.values() if isinstance(v, (dict, list))]))
+        elif isinstance(cur, list):
+            stack.extend(reversed([v for v in cur if isinstance(v, (dict, list))]))
+
+def json_strings(obj):
+    stack = [obj]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, str):
+            yield cur
+        elif isinstance(cur, dict):
+            stack.extend(cur.values())
+        elif isinstance(cur, list):
+            stack.extend(cur)
+
+def decode_gql_id(raw):
+    """'RGVtYW5kVXNlcjoxMjM=' (DemandUser:123) ou '123' -> '123'"""
+    raw = str(raw or "")
+    if raw.isdigit():
+        return raw
+    try:
+        dec = base64.b64decode(raw + "=" * (-len(raw) % 4)).decode("utf-8")
+    except Exception:
+        return ""
+    tail = dec.rsplit(":", 1)[-1]
+    return tail if tail.isdigit() else ""
+
+def joined_year_from_time_as_host(tah, now=None):
+    now = now or datetime.datetime.utcnow()
+    try:
+        months = int(tah.get("years") or 0) * 12 + int(tah.get("months") or 0)
+    except (TypeError, ValueError):
+        return ""
+    if not months:
+        return ""
+    y, m = now.year, now.month - months
+    while m <= 0:
+        m += 12
+        y -= 1
+    return str(y)
+
+def find_host_card(blob):
+    for d in walk_json(blob):
+        if "timeAsHost" in d or ("userId" in d and ("ratingAverage" in d or "isSuperhost" in d)):
+            return d
+    return None
+
+def extract_embedded_fields(html, listing_url):
+    """
+    Extrait titre, hôte et licence depuis le JSON embarqué en une seule passe.
+    Retourne (fields, found): `fields` ne contient que les champs trouvés,
+    `found` indique si un blob d'état a été trouvé dans la page.
+    """
+    blobs = load_embedded_json(html)
+    fields = {}
+    for blob in blobs:
+        for d in walk_json(blob):
+            if "title" not in fields:
+                sc = d.get("sharingConfig")
+                if isinstance(sc, dict) and isinstance(sc.get("title"), str) and sc["title"].strip():
+                    fields["title"] = sc["title"].strip()
+                elif isinstance(d.get("listingTitle"), str) and d["listingTitle"].strip():
+                    fields["title"] = d["listingTitle"].strip()
+
+        card = find_host_card(blob)
+        if card and "host_profile_url" not in fields:
+            uid = decode_gql_id(card.get("userId") or card.get("hostId"))
+            if not uid:
+                for st in json_strings(card):
+                    m = RE_USER_PATH.search(st)
+                    if m:
+                        uid = m.group(0).rsplit("/", 1)[-1]
+                        break
+            if uid:
+                fields["host_profile_url"] = urljoin(listing_url, f"/users/show/{uid}")
+            name = card.get("name") or card.get("hostName") or ""
+            if isinstance(name, str) and name.strip() and len(name) < 60:
+                fields["host_name"] = name.strip()
+            rating = card.get("ratingAverage")
+            if isinstance(rating, (int, float)) and rating > 0:
+                fields["host_overall_rating"] = str(rating)
+            tah = card.get("timeAsHost")
+            if isinstance(tah, dict):
+                year = joined_year_from_time_as_host(tah)
+                if year:
+                    fields["host_joined"] = year
+
+        if "license_code" not in fields:
+            for st in json_strings(blob):
+                if has_label(st):
+                    code = license_from_text(st)
+                    if code:
+                        fields["license_code"] = code
+                        break
+        if "license_code" not in fields:
+            # Libellé et code dans des chaînes distinctes: section "Registration details"
+            # dont les éléments portent {"title": "Registration number", "subtitle": "ABC-123"}
+            for d in walk_json(blob):
+                labels = [v for v in d.values() if isinstance(v, str) and has_label(v)]
+                if labels:
+                    rest = [st for st in json_strings(d) if st not in labels]
+                    code = license_from_text("\n".join(labels + rest))
+                    if code:
+                        fields["license_code"] = code
+                        break
+
+    return fields, bool(blobs)
 
 # ---------------- HOST (VERSION FINALE CORRIGÉE) ----------------
 
+def _heading(box, h, text):
+    return {"sel": f'{box}:has({h}:has-text("{text}"))', "box": box, "inner": h, "text": text}
+
+def _inside(box, inner):
+    return {"sel": f"{box}:has({inner})", "box": box, "inner": inner}
+
+def _css(sel):
+    return {"sel": sel, "inner": sel}
+
+# Registre des stratégies de détection du bloc hôte. L'ordre ci-dessous n'est que
+# l'ordre initial: il est réappris par domaine/locale (taux de succès, latence).
+HOST_STRATEGIES = [
+    # Français
+    _heading("section", "h2", "Faites connaissance avec votre hôte"),
+    _heading("section", "h2", "Rencontrez votre hôte"),
+    _heading("section", "h3", "Faites connaissance"),
+    _heading("div", "h2", "Faites connaissance"),
+    # Anglais
+    _heading("section", "h2", "Meet your Host"),
+    _heading("section", "h2", "Get to know your host"),
+    _heading("section", "h3", "Meet your Host"),
+    _heading("div", "h2", "Meet your Host"),
+    # Espagnol
+    _heading("section", "h2", "Conoce a tu anfitri"),
+    # Allemand
+    _heading("section", "h2", "Erfahre mehr über deinen Gastgeber"),
+    # Sélecteurs génériques - NOUVEAU PATTERN /users/profile/
+    _inside("section", 'a[href*="/users/profile/"]'),
+    _inside("section", 'a[href*="/users/show/"]'),
+    _css('div[data-section-id*="HOST"]'),
+    _css('div[data-plugin-in-point-id*="HOST"]'),
+]
+
+# Évalue les stratégies dans l'ordre donné, en une seule exécution dans la page,
+# et s'arrête à la première qui trouve un élément visible.
+FIND_SECTION_JS = """
+(strategies) => {
+  const visible = (el) => {
+    if (!el || !el.getClientRects().length) return false;
+    const st = getComputedStyle(el);
+    return st.visibility !== 'hidden' && st.display !== 'none';
+  };
+  const norm = (s) => (s || '').replace(/\\s+/g, ' ').toLowerCase();
+  const timings = [];
+  for (let i = 0; i < strategies.length; i++) {
+    const s = strategies[i];
+    const t0 = performance.now();
+    let hit = false;
+    for (const el of document.querySelectorAll(s.inner)) {
+      if (s.text && !norm(el.textContent).includes(norm(s.text))) continue;
+      const target = s.box ? el.closest(s.box) : el;
+      if (visible(target)) { hit = true; break; }
+    }
+    timings.push(performance.now() - t0);
+    if (hit) return {index: i, timings};
+  }
+  return {index: -1, timings};
+}
+"""
+
 def find_host_section(page):
     """
-    Liste étendue de sélecteurs pour trouver le bloc hôte
-    CORRIGÉ: Priorité au nouveau pattern /users/profile/
-    """
-    candidates = [
-        # Français
-        'section:has(h2:has-text("Faites connaissance avec votre hôte"))',
-        'section:has(h2:has-text("Rencontrez votre hôte"))',
-        'section:has(h3:has-text("Faites connaissance"))',
-        'div:has(h2:has-text("Faites connaissance"))',
-        # Anglais
-        'section:has(h2:has-text("Meet your Host"))',
-        'section:has(h2:has-text("Get to know your host"))',
-        'section:has(h3:has-text("Meet your Host"))',
-        'div:has(h2:has-text("Meet your Host"))',
-        # Espagnol
-        'section:has(h2:has-text("Conoce a tu anfitri"))',
-        # Allemand
-        'section:has(h2:has-text("Erfahre mehr über deinen Gastgeber"))',
-        # Sélecteurs génériques - NOUVEAU PATTERN /users/profile/ EN PRIORITÉ
-        'section:has(a[href*="/users/profile/"])',
-        'section:has(a[href*="/users/show/"])',
-        'div[data-section-id*="HOST"]',
-        'div[data-plugin-in-point-id*="HOST"]',
-    ]
-    
-    for sel in candidates:
+    Trouve le bloc hôte via le registre HOST_STRATEGIES, classé par succès passés
+    pour ce domaine/locale, en un seul aller-retour JS (au lieu de count() +
+    is_visible() par sélecteur).
+    """
+    key = selector_memory.memory_key(page, LOCALE)
+    ranked = selector_memory.ranked("host_section", key, [s["sel"] for s in HOST_STRATEGIES])
+    by_sel = {s["sel"]: s for s in HOST_STRATEGIES}
+    strategies = [by_sel[sel] for sel in ranked]
+
+    with timer("host.find_section"):
         try:
-            loc = page.locator(sel).first
-            if loc.count() and loc.is_visible():
-                print(f"✓ Bloc hôte trouvé avec: {sel[:60]}...")
-                return loc
-        except Exception:
-            continue
-    
+            res = page.evaluate(FIND_SECTION_JS, strategies)
+        except Exception as e:
+            print(f"⚠ Erreur recherche bloc hôte: {e}")
+            res = {"index": -1, "timings": []}
+
+    for i, ms in enumerate(res["timings"]):
+        selector_memory.record_strategy("host_section", key, ranked[i], hit=(i == res["index"]), ms=ms)
+
+    if res["index"] >= 0:
+        sel = ranked[res["index"]]
+        print(f"✓ Bloc hôte trouvé avec: {sel[:60]}...")
+        count("host.section", selector=sel[:60], rank=res["index"])
+        return page.locator(sel).filter(visible=True).first
+
+    count("host.section", selector="none")
     print("⚠ Bloc hôte spécifique non trouvé, utilisation de stratégies alternatives...")
     return None
 
@@ -196,13 +791,9 @@ def extract_host_fields(page, listing_url):
     """
     host_name = host_overall_rating = host_profile_url = host_joined = ""
     
-    # Scroll pour charger le bloc hôte
-    try:
-        for _ in range(6):
-            page.mouse.wheel(0, 1400)
-            page.wait_for_timeout(250)
-    except Exception:
-        pass
+    # Scroll pour charger le bloc hôte: s'arrête dès qu'il apparaît
+    with timer("host.scroll"):
+        scroll_until(page, HOST_SIGNAL)
 
     # Étape 1: Trouver le bloc hôte
     sect = find_host_section(page)
@@ -211,7 +802,7 @@ def extract_host_fields(page, listing_url):
         # Scroll additionnel si non trouvé
         try:
             page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            page.wait_for_timeout(700)
+            page.wait_for_selector(HOST_SIGNAL, state="attached", timeout=1500)
         except Exception:
             pass
         sect = find_host_section(page)
@@ -233,6 +824,7 @@ def extract_host_fields(page, listing_url):
                             # Construire l'URL complète (enlever les query params)
                             host_profile_url = urljoin(listing_url, href.split("?")[0])
                             print(f"✓ URL hôte trouvée (bloc): {host_profile_url}")
+                            count("host.url_strategy", strategy="section")
                             
                             # Extraire le nom depuis ce lien
                             try:
@@ -268,6 +860,7 @@ def extract_host_fields(page, listing_url):
                         if href and ("/users/profile/" in href or "/users/show/" in href):
                             host_profile_url = urljoin(listing_url, href.split("?")[0])
                             print(f"✓ URL hôte trouvée (fallback page): {host_profile_url}")
+                            count("host.url_strategy", strategy="page_links")
                             
                             # Essayer d'extraire le nom
                             try:
@@ -289,23 +882,13 @@ def extract_host_fields(page, listing_url):
     if not host_profile_url:
         print("→ Dernière tentative: Analyse HTML brut...")
         try:
-            html = page.content()
-            
-            # Regex pour trouver les URLs /users/profile/ OU /users/show/ dans le HTML
-            patterns = [
-                r'href="(https?://[^"]*?/users/profile/[^"?]+)',  # URL complète /profile/
-                r'href="(/users/profile/[^"?]+)',                  # URL relative /profile/
-                r'href="(https?://[^"]*?/users/show/[^"?]+)',     # URL complète /show/
-                r'href="(/users/show/[^"?]+)',                     # URL relative /show/
-            ]
-            
-            for pattern in patterns:
-                matches = re.findall(pattern, html)
-                if matches:
-                    href = matches[0]
-                    host_profile_url = urljoin(listing_url, href)
-                    print(f"✓ URL hôte trouvée (regex HTML): {host_profile_url}")
-                    break
+            with timer("host.html_regex"):
+                # /users/profile/ puis /users/show/, URL complète avant relative
+                hrefs = profile_hrefs(page_html(page, "profiles"))
+            if hrefs:
+                host_profile_url = urljoin(listing_url, hrefs[0])
+                print(f"✓ URL hôte trouvée (regex HTML): {host_profile_url}")
+                count("host.url_strategy", strategy="html_regex")
         except Exception as e:
             print(f"⚠ Erreur analyse HTML: {e}")
     
@@ -319,24 +902,14 @@ def extract_host_fields(page, listing_url):
     
     # Si pas de bloc, utiliser toute la page
     if not block_text:
-        try:
-            block_text = page.locator("body").inner_text(timeout=3000)
-        except:
-            block_text = ""
+        block_text = body_text(page, HOST_STAT_NEEDLES, NEAR, NEAR)
     
     # Rating de l'hôte
     if block_text:
-        m = re.search(r"(\d+(?:[.,]\d+)?)\s*[★*]", block_text) \
-            or re.search(r"Note globale\s*:?[\s\n]*([0-9]+(?:[.,][0-9]+)?)", block_text, re.I) \
-            or re.search(r"(\d+(?:[.,]\d+)?)\s*[•·]\s*(?:avis|reviews)", block_text, re.I)
-        if m:
-            host_overall_rating = m.group(1).replace(",", ".")
+        host_overall_rating, host_joined = host_stats_from_text(block_text)
+        if host_overall_rating:
             print(f"✓ Rating hôte: {host_overall_rating}")
-        
-        # Année d'inscription
-        m2 = re.search(r"(depuis|since)\s+(?:\w+\s+)?(\d{4})", block_text, re.I)
-        if m2:
-            host_joined = m2.group(2)
+        if host_joined:
             print(f"✓ Année inscription: {host_joined}")
     
     return host_name, host_overall_rating, host_profile_url, host_joined
@@ -344,41 +917,84 @@ def extract_host_fields(page, listing_url):
 # ---------------- parsing PDP ----------------
 
 def parse_listing(page, url):
+    with timer("listing.total"):
+        return _parse_listing(page, url)
+
+def _parse_listing(page, url):
     print(f"\n{'='*60}")
     print(f"Scraping: {url}")
     print(f"{'='*60}")
     
-    data = {
-        "url": url, "title": "", "license_code": "",
-        "host_name": "", "host_overall_rating": "",
-        "host_profile_url": "", "host_joined": "", "scraped_at": now_iso()
-    }
+    data = empty_row(url)
+    sources = {}
+    emit("listing.started", url=url)
     try:
-        page.goto(url, wait_until="domcontentloaded", timeout=60000)
-        page.wait_for_timeout(600)
+        snap = lean_snapshot(page)
+        with timer("listing.goto"):
+            navigate(page, url)
+            # Signal réel de rendu plutôt qu'un délai fixe
+            try:
+                page.wait_for_selector('meta[property="og:title"], h1', state="attached", timeout=5000)
+            except Exception:
+                count("timeouts", where="listing.ready")
+        lean_report(page, snap, "annonce")
+
+        # JSON embarqué: tous les champs en un seul page.content()
+        emb = {}
+        if EMBEDDED_JSON:
+            try:
+                with timer("listing.embedded_json"):
+                    emb, _ = extract_embedded_fields(page_html(page, "state"), url)
+            except Exception as e:
+                print(f"⚠ Erreur JSON embarqué: {e}")
+            for k, v in emb.items():
+                data[k] = v
+                sources[k] = "json"
+            if emb:
+                print(f"✓ JSON embarqué: {', '.join(sorted(emb))}")
 
         # Titre
-        title = ""
-        try:
-            title = page.locator('meta[property="og:title"]').first.get_attribute("content")
-        except:
-            pass
+        title = data["title"]
+        if not title:
+            try:
+                title = page.locator('meta[property="og:title"]').first.get_attribute("content")
+            except:
+                pass
         if not title:
             title = get_text_safe(page.locator('h1[data-testid="title"]')) or get_text_safe(page.locator("h1"))
         
-        data["title"] = title
+        if title and not data["title"]:
+            data["title"] = title
+            sources["title"] = "dom"
         if title:
             print(f"✓ Titre: {title[:60]}...")
 
-        # Host via fonction corrigée
-        hn, hr, hp, hj = extract_host_fields(page, url)
-        data.update({"host_name": hn, "host_profile_url": hp, "host_overall_rating": hr, "host_joined": hj})
+        # Host via fonction corrigée (secours DOM pour les champs que le JSON n'a pas donnés)
+        host_keys = ("host_name", "host_overall_rating", "host_profile_url", "host_joined")
+        if not all(data[k] for k in host_keys):
+            with timer("listing.host_dom"):
+                hn, hr, hp, hj = extract_host_fields(page, url)
+            for k, v in zip(host_keys, (hn, hr, hp, hj)):
+                if v and not data[k]:
+                    data[k] = v
+                    sources[k] = "dom"
+        hn, hr, hp, hj = (data[k] for k in host_keys)
 
-        # Licence
-        data["license_code"] = extract_license_code(page)
+        # Licence (secours DOM si le JSON n'a pas donné de code)
+        if not data["license_code"]:
+            with timer("listing.license_dom"):
+                data["license_code"] = extract_license_code(page)
+            if data["license_code"]:
+                sources["license_code"] = "dom"
         if data["license_code"]:
             print(f"✓ Licence: {data['license_code']}")
 
+        record_page(page, url, "listing")
+        data["sources"] = sources
+        for k in ("title", "license_code") + host_keys:
+            count("field", field=k, source=sources.get(k, "miss"))
+            emit("field", url=url, field=k, hit=k in sources, source=sources.get(k, "miss"))
+
         # Résumé
         print(f"\n📊 Résumé pour cette annonce:")
         print(f"   • URL hôte: {'✓' if hp else '✗'} {hp[:50] if hp else 'NON TROUVÉE'}")
@@ -386,41 +1002,661 @@ def parse_listing(page, url):
         print(f"   • Rating: {'✓' if hr else '✗'} {hr if hr else 'NON TROUVÉ'}")
         print(f"   • Année: {'✓' if hj else '✗'} {hj if hj else 'NON TROUVÉE'}")
         print(f"   • Licence: {'✓' if data['license_code'] else '✗'} {data['license_code'] if data['license_code'] else 'NON TROUVÉE'}")
+        print(f"   • Sources: {', '.join(f'{k}={v}' for k, v in sorted(sources.items())) or '-'}")
 
     except Exception as e:
         print(f"❌ ERROR parsing {url}: {e}")
+        count("listing.error", kind=type(e).__name__)
+        data["error"] = type(e).__name__
     
     return data
 
+# ---------------- profils hôtes (Phase 2 en Python) ----------------
+
+PROFILE_JS = """(maxText) => {
+  const q = (sel) => document.querySelector(sel);
+  const meta = (sel) => (q(sel) && q(sel).getAttribute("content")) || null;
+  const h1 = q("h1") || q('[data-testid*="profile"][data-testid*="heading"], [data-testid="user-profile__heading"]');
+  return {
+    h1: h1 ? h1.textContent : null,
+    metaTitle: meta('meta[property="og:title"]') || meta('meta[name="twitter:title"]'),
+    metaDesc: meta('meta[name="description"]'),
+    text: document.body ? (maxText ? document.body.innerText.slice(0, maxText) : document.body.innerText) : "",
+    ldJson: Array.from(document.querySelectorAll('script[type="application/ld+json"]')).map(s => s.textContent || ""),
+  };
+}"""
+
+def scrape_host(page, url):
+    """Profil hôte -> ligne Phase 2 (url, name, rating, joined_year, years_active, listing_count, notes)"""
+    with timer("host.total"):
+        try:
+            navigate(page, url)
+            try:
+                page.wait_for_selector('h1, [data-testid*="profile"], section', state="attached", timeout=5000)
+            except Exception:
+                count("timeouts", where="host.ready")
+            # Les statistiques du profil arrivent au défilement
+            scroll_until(page, 'a[href*="/rooms/"]', steps=3)
+            html = page_html(page, "state")
+            row = host_profile_row(url, page.evaluate(PROFILE_JS, TEXT_WINDOW_CHARS if MEMORY_MODE else 0),
+                                   html, load_embedded_json(html, NEXT_DATA_IDS))
+        except Exception as e:
+            print(f"❌ ERROR profil hôte {url}: {e}")
+            count("host.error", kind=type(e).__name__)
+            return {"url": url, "notes": f"Erreur: {e}", "error": type(e).__name__}
+    for k in ("name", "rating", "joined_year", "listing_count"):
+        count("host.field", field=k, result="hit" if row[k] != "" else "miss")
+    print(f"👤 {url} => {row['name'] or '?'} | note {row['rating'] or '?'} | "
+          f"annonces {row['listing_count'] or '?'} | depuis {row['joined_year'] or '?'}")
+    return row
+
+def drain_hosts(pages, hosts, deadline=None, first=None):
+    """Profils de la file jusqu'à la fin des annonces; passé `deadline`, le reste est laissé"""
+    while True:
+        url, first = first or hosts.next_job(), None
+        if url is None:
+            return
+        if deadline is not None and time.time() >= deadline:
+            hosts.jobs.put(url)
+            hosts.skip_rest("budget")
+            continue
+        try:
+            proxy = proxy_pool.acquire()
+        except NoHealthyProxy as e:
+            print(f"❌ {e}: arrêt du worker hôtes")
+            hosts.jobs.put(url)
+            return
+        row = None
+        t0 = time.time()
+        try:
+            row = scrape_host(pages.get(proxy), url)
+        finally:
+            proxy_pool.release(proxy, row_outcome(row) if row is None or row.get("error") else "ok",
+                               time.time() - t0)
+        pages.recycle(proxy)
+        hosts.write(row)
+
+def host_worker_thread(hosts, deadline=None):
+    """Worker profils hôtes: son propre navigateur, lancé seulement au premier profil en file"""
+    url = hosts.next_job()
+    if url is None:
+        return
+    try:
+        with sync_playwright() as p:
+            browser = launch_browser(p)
+            context = new_context(browser)
+            pages = ProxyPages(context.new_page())
+            try:
+                drain_hosts(pages, hosts, deadline, first=url)
+            finally:
+                pages.close()
+                context.close()
+                browser.close()
+    except Exception as e:
+        print(f"❌ Worker hôtes arrêté: {e}")
+
+# ---------------- workers ----------------
+
+def launch_browser(p):
+    launch_args = {"headless": True}
+    if PROXY and not proxy_pool.active:
+        launch_args["proxy"] = {"server": PROXY}
+    return p.chromium.launch(**launch_args)
+
+def new_context(browser, storage_state=None, proxy=None):
+    context = browser.new_context(
+        storage_state=storage_state,
+        proxy=proxy.settings if proxy else None,
+        locale=LOCALE,
+        user_agent=("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                    "(KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"),
+        viewport={"width":1280,"height":1600},
+        timezone_id="Europe/Paris",
+        **context_options(),
+    )
+    install_byte_counter(context)
+    if proxy:
+        _context_limiters[id(context)] = proxy.limiter
+    if install_replay_routes(context):
+        return context
+    if LEAN_MODE:
+        install_lean_routes(context)
+    return context
+
+def scrape_or_cached(page, url, change=None):
+    """
+    Consulte le cache disque avant de naviguer vers l'annonce.
+    change: "unchanged" (carte identique: cache jusqu'au rafraîchissement forcé),
+    "changed" (carte modifiée: cache ignoré), "new" ou None (TTL normal)
+    """
+    cached = cache_get(url, unchanged=(change == "unchanged")) if change != "changed" else None
+    if cached:
+        why = "carte inchangée, " if change == "unchanged" else ""
+        print(f"♻ Cache: {url} ({why}scrapé il y a {age_hours(cached['scraped_at']):.1f}h)")
+        count("cache", result="hit")
+        return cached
+    row = parse_listing(page, url)
+    if not row.get("error") and (row.get("title") or row.get("host_profile_url")):
+        cache_put(row)
+    return row
+
+RECYCLE_REASONS = {"listings": "quota d'annonces atteint", "rss": "seuil RSS dépassé"}
+
+class ProxyPages:
+    """
+    Une page par proxy du pool, ouverte à la demande dans le navigateur de `page`.
+    Recyclage (RECYCLE_EVERY / RECYCLE_RSS_MB): la page et son contexte sont
+    remplacés par des neufs; la page de l'appelant reste ouverte sur about:blank.
+    """
+
+    def __init__(self, page):
+        self.caller = self.default = page
+        self.browser = page.context.browser
+        self.pages = {}
+        self.recycler = Recycler()
+
+    def get(self, proxy):
+        if proxy is None:
+            return self.default
+        if proxy.label not in self.pages:
+            context = new_context(self.browser, proxy=proxy)
+            self.pages[proxy.label] = context.new_page()
+        return self.pages[proxy.label]
+
+    def recycle(self, proxy):
+        """À appeler après chaque annonce ou profil servi par la page de `proxy`"""
+        why = self.recycler.due(proxy.label if proxy else "")
+        if not why:
+            return
+        print(f"♻ Recyclage page/contexte ({RECYCLE_REASONS[why]})")
+        if proxy is not None:
+            self._close(self.pages.pop(proxy.label, None))
+            return
+        old = self.default
+        self.default = new_context(self.browser).new_page()
+        if old is self.caller:
+            try:
+                old.goto("about:blank")
+            except Exception:
+                pass
+        else:
+            self._close(old)
+
+    def _close(self, pg):
+        if pg is None:
+            return
+        _context_limiters.pop(id(pg.context), None)
+        try:
+            pg.context.close()
+        except Exception:
+            pass
+
+    def close(self):
+        for pg in self.pages.values():
+            self._close(pg)
+        self.pages = {}
+        if self.default is not self.caller:
+            self._close(self.default)
+            self.default = self.caller
+
+def row_outcome(row):
+    """Résultat à signaler au pool de proxies (None: ligne venue du cache)"""
+    if row is None:
+        return "error"
+    if row.get("error"):
+        return "blocked" if row["error"] == BlockedPage.__name__ else "error"
+    return "ok" if "sources" in row else None
+
+def drain_queue(page, jobs, results, changes=None, hosts=None, deadline=None):
+    pages = ProxyPages(page)
+    try:
+        _drain_queue(pages, jobs, results, changes or {}, hosts, deadline)
+    finally:
+        pages.close()
+
+def _drain_queue(pages, jobs, results, changes, hosts=None, deadline=None):
+    """
+    Chaque annonce finie met son hôte en file pour les workers hôtes (`hosts`).
+    Passé `deadline` (time.time()), les annonces restantes sont laissées au prochain run.
+    """
+    while True:
+        over = deadline is not None and time.time() >= deadline
+        try:
+            i, u, attempt = jobs.get_nowait()
+        except queue.Empty:
+            return
+        if over:
+            count("listing.skipped", reason="budget")
+            emit("listing.skipped", url=u, reason="budget")
+            continue
+        try:
+            proxy = proxy_pool.acquire()
+        except NoHealthyProxy as e:
+            print(f"❌ {e}: arrêt du worker")
+            jobs.put((i, u, attempt))
+            return
+        row = None
+        t0 = time.time()
+        try:
+            row = scrape_or_cached(pages.get(proxy), u, changes.get(u))
+        finally:
+            proxy_pool.release(proxy, row_outcome(row), time.time() - t0)
+        if row_outcome(row) is not None:   # page réellement visitée (pas le cache)
+            pages.recycle(proxy)
+        if row.get("error") and attempt < LISTING_RETRIES:
+            # Remise en fin de file: retentée après les autres, derrière le limiteur
+            count("listing.requeued")
+            emit("listing.requeued", url=u, attempt=attempt + 1, error=row["error"])
+            print(f"🔁 Annonce remise en fin de file ({attempt + 1}/{LISTING_RETRIES}): {u}")
+            jobs.put((i, u, attempt + 1))
+            continue
+        results[i] = row
+        journal_append(JOURNAL, "listing", u, row=row)
+        emit("listing.finished", url=u, cached=row_outcome(row) is None, error=row.get("error", ""),
+             seconds=round(time.time() - t0, 2))
+        if hosts is not None and row.get("host_profile_url"):
+            hosts.submit([row["host_profile_url"]])
+
+def worker_thread(jobs, results, changes=None, hosts=None, deadline=None):
+    """Worker secondaire: son propre Playwright/navigateur (l'API sync n'est pas thread-safe)"""
+    try:
+        with sync_playwright() as p:
+            browser = launch_browser(p)
+            context = new_context(browser)
+            try:
+                drain_queue(context.new_page(), jobs, results, changes, hosts, deadline)
+            finally:
+                context.close()
+                browser.close()
+    except Exception as e:
+        print(f"❌ Worker arrêté: {e}")
+
+def scrape_listings(page, urls, workers=WORKERS, done_rows=None, changes=None, hosts=None, deadline=None):
+    """
+    Scrape les annonces avec N workers. Le thread principal réutilise `page`,
+    les N-1 autres ouvrent leur propre navigateur. L'ordre des lignes suit `urls`.
+    Les annonces présentes dans `done_rows` (reprise) ne sont pas revisitées.
+    `changes`: {url: "new"/"changed"/"unchanged"} issu des empreintes de cartes.
+    `hosts` (HostStage): profils hôtes scrapés au fil de l'eau par hosts.concurrency
+    workers dédiés, en parallèle des annonces.
+    `deadline` (time.time()): plus aucune annonce commencée après, lignes vides à la place.
+    """
+    done_rows = done_rows or {}
+    jobs = queue.Queue()
+    results = [None] * len(urls)
+    for i, u in enumerate(urls):
+        if u in done_rows:
+            results[i] = done_rows[u]
+        else:
+            jobs.put((i, u, 0))
+    if done_rows:
+        print(f"⏩ Reprise: {len(urls) - jobs.qsize()} annonce(s) déjà faites, {jobs.qsize()} restante(s)")
+        if hosts is not None:
+            hosts.submit([r["host_profile_url"] for r in done_rows.values() if r.get("host_profile_url")])
+    if jobs.qsize():
+        emit("listing.queued", n=jobs.qsize())
+
+    host_threads = []
+    if hosts is not None:
+        host_threads = [threading.Thread(target=host_worker_thread, args=(hosts, deadline), daemon=True)
+                        for _ in range(hosts.concurrency)]
+    threads = [threading.Thread(target=worker_thread, args=(jobs, results, changes, hosts, deadline), daemon=True)
+               for _ in range(min(workers, jobs.qsize()) - 1)]
+    for t in host_threads + threads:
+        t.start()
+    try:
+        drain_queue(page, jobs, results, changes, hosts, deadline)
+        for t in threads:
+            t.join()
+    finally:
+        if hosts is not None:
+            # Plus d'annonces: les workers hôtes vident la file puis s'arrêtent
+            hosts.finish_listings()
+    for t in host_threads:
+        t.join()
+
+    return [r if r is not None else empty_row(u) for r, u in zip(results, urls)]
+
 # ---------------- main ----------------
 
+def collect_on_proxy(page, start_url, accept_cookies=True, sigs=None, max_items=None, max_minutes=None):
+    """Collecte sur le proxy le plus sain du pool (ou directement sur `page` sans pool)"""
+    pages = ProxyPages(page)
+    proxy = proxy_pool.acquire()
+    urls, outcome = [], "error"
+    try:
+        with timer("search.collect"):
+            # Un contexte de proxy est neuf: bannière cookies à accepter
+            urls = collect_listing_urls(pages.get(proxy), max_items or MAX_LIST, max_minutes or MAX_MINUTES,
+                                        start_url, accept_cookies or proxy is not None, sigs)
+        outcome = "ok" if urls else "error"
+    except BlockedPage:
+        outcome = "blocked"
+        raise
+    finally:
+        proxy_pool.release(proxy, outcome)
+        pages.close()
+    return urls
+
+def detect_changes(urls, sigs):
+    """{url: "new"/"changed"/"unchanged"} par rapport aux empreintes du run précédent"""
+    if not (CHANGE_DETECTION and cache_enabled() and sigs):
+        return {}
+    prev = signatures_get(urls)
+    changes = {}
+    for u in urls:
+        old = prev.get(canonical_room_url(u))
+        changes[u] = "new" if old is None else ("unchanged" if sigs.get(u) == old else "changed")
+    n = {k: sum(1 for c in changes.values() if c == k) for k in ("new", "changed", "unchanged")}
+    for kind, k in n.items():
+        count("change", k, kind=kind)
+    print(f"🔎 Cartes: {n['new']} nouvelle(s), {n['changed']} modifiée(s), {n['unchanged']} inchangée(s)")
+    return changes
+
+def write_delta(rows, sigs, changes, out_csv):
+    """
+    Delta du run (nouvelles annonces, cartes modifiées, rafraîchissements forcés)
+    à côté du snapshot complet, puis mémorise les empreintes des annonces réussies.
+    """
+    delta = []
+    for r in rows:
+        change = changes.get(r["url"])
+        if change in ("new", "changed") or "sources" in r:
+            delta.append(dict(r, change=change if change != "unchanged" else "refreshed"))
+    path = os.path.splitext(out_csv)[0] + "_delta.csv"
+    write_csv(delta, path, extra=("change",))
+    print(f"🔎 Delta: {len(delta)} ligne(s) → {path}")
+    ok = {r["url"]: sigs[r["url"]] for r in rows
+          if r["url"] in sigs and not r.get("error") and (r.get("title") or r.get("host_profile_url"))}
+    signatures_put(ok, now_iso())
+
+def scrape_search(page, start_url, out_csv, done, workers=WORKERS, accept_cookies=True):
+    """
+    Une page de recherche: collecte (ou reprise), annonces, écriture CSV/Parquet.
+    Avec le cache, seules les annonces nouvelles ou à carte modifiée sont revisitées;
+    out_csv reste le snapshot complet, *_delta.csv ne contient que ce qui a changé.
+    HOST_STAGE: les profils hôtes sont scrapés dans la foulée (CSV hôtes, cf. host_profiles.py).
+    """
+    search = done.get("search", {}).get(start_url)
+    sigs = {}
+    if search:
+        urls = search["urls"]
+        sigs = search.get("sigs", {})
+        print(f"⏩ Reprise: {len(urls)} URL(s) d'annonces déjà collectées")
+    else:
+        urls = collect_on_proxy(page, start_url, accept_cookies, sigs)
+        journal_append(JOURNAL, "search", start_url, urls=urls, sigs=sigs)
+    changes = detect_changes(urls, sigs)
+    done_rows = {k: e["row"] for k, e in done.get("listing", {}).items() if "row" in e}
+    hosts = HostStage(out_csv) if HOST_STAGE else None
+    try:
+        rows = scrape_listings(page, urls, workers=workers, done_rows=done_rows, changes=changes, hosts=hosts)
+    finally:
+        if hosts is not None:
+            hosts.close()
+
+    write_csv(rows, out_csv)
+    if changes:
+        write_delta(rows, sigs, changes, out_csv)
+    selector_memory.save()
+    if PARQUET:
+        write_parquet(lambda: iter(rows), os.path.splitext(out_csv)[0] + ".parquet", LISTING_TYPES, "url")
+    emit("page.done", search=start_url, out_csv=out_csv, rows=len(rows))
+    print(f"\n{'='*60}")
+    print(f"✅ SAVED {len(rows)} rows to {out_csv}")
+    print(f"{'='*60}")
+    return rows
+
+def batch_csv(n):
+    """CSV de la recherche n du lot: OUT_CSV avec {n} (ex: output_phase1/page_{n}_listings.csv), sinon base_n.csv"""
+    if "{n}" in OUT_CSV:
+        return OUT_CSV.format(n=n)
+    base, ext = os.path.splitext(OUT_CSV)
+    return f"{base}_{n}{ext}"
+
+def harvest_batch(page, markets, done, deadline):
+    """
+    Collecte de toutes les recherches (au plus MARKET_QUOTA annonces chacune) dans
+    une file unique: une annonce vue sous plusieurs recherches n'est gardée qu'une fois.
+    -> (URLs à scraper, empreintes, [(n, url de recherche, URLs de la recherche)])
+    """
+    owners, sigs, per_market = {}, {}, []
+    accept_cookies = True
+    for n, start_url in markets:
+        left = (deadline - time.time()) / 60
+        if left <= 0:
+            print(f"⏱ Budget du lot épuisé: recherches {n}+ non collectées")
+            count("batch.market_skipped", len(markets) - len(per_market))
+            break
+        search = done.get("search", {}).get(start_url)
+        if search:
+            urls, found = search["urls"], search.get("sigs", {})
+            print(f"⏩ Recherche {n}: {len(urls)} URL(s) déjà collectées")
+        else:
+            print(f"\n🌍 Recherche {n}/{len(markets)}: {start_url[:90]}")
+            found = {}
+            try:
+                urls = collect_on_proxy(page, start_url, accept_cookies, found,
+                                        max_items=MARKET_QUOTA, max_minutes=min(MAX_MINUTES, left))
+            except Exception as e:
+                print(f"❌ Collecte en échec pour la recherche {n}: {e}")
+                count("batch.market_error", kind=type(e).__name__)
+                urls = []
+            else:
+                # Seule une collecte réussie compte à la reprise (un échec sera retenté)
+                journal_append(JOURNAL, "search", start_url, urls=urls, sigs=found)
+                accept_cookies = False
+        mine, dup = [], 0
+        for u in urls:
+            key = canonical_room_url(u)
+            if key in owners:
+                dup += 1
+            else:
+                owners[key] = u
+                if u in found:
+                    sigs[u] = found[u]
+            mine.append(owners[key])
+        count("batch.urls", len(urls), kind="harvested")
+        count("batch.urls", dup, kind="duplicate")
+        print(f"🧮 Recherche {n}: {len(urls)} annonce(s), {dup} déjà dans la file ({len(owners)} au total)")
+        per_market.append((n, start_url, list(dict.fromkeys(mine))))
+    return list(owners.values()), sigs, per_market
+
+def scrape_batch(page, path, done):
+    """
+    Mode lot (--batch): toutes les recherches de `path` (commentaires '#' ignorés),
+    une file d'annonces dédupliquée entre recherches vidée par parse_listing,
+    quota par recherche (MARKET_QUOTA) et budget global (BATCH_MINUTES).
+    Un CSV par recherche (batch_csv), le delta du lot à côté d'OUT_CSV.
+    """
+    from orchestrator import read_search_urls
+    markets = read_search_urls(path)
+    deadline = time.time() + BATCH_MINUTES * 60
+    print(f"📦 Lot: {len(markets)} recherche(s), {MARKET_QUOTA} annonce(s) max chacune, "
+          f"budget {BATCH_MINUTES:.0f} min")
+    urls, sigs, per_market = harvest_batch(page, markets, done, deadline)
+    total = sum(len(m) for _, _, m in per_market)
+    print(f"\n📦 File unique: {len(urls)} annonce(s) pour {total} occurrence(s) "
+          f"({total - len(urls)} fetch évité(s) par la dédup)")
+
+    changes = detect_changes(urls, sigs)
+    done_rows = {k: e["row"] for k, e in done.get("listing", {}).items() if "row" in e}
+    hosts = HostStage(OUT_CSV.replace("{n}", "batch")) if HOST_STAGE else None
+    try:
+        rows = scrape_listings(page, urls, done_rows=done_rows, changes=changes, hosts=hosts, deadline=deadline)
+    finally:
+        if hosts is not None:
+            hosts.close()
+    by_url = dict(zip(urls, rows))
+
+    for n, search_url, mine in per_market:
+        out_csv = batch_csv(n)
+        market_rows = [by_url[u] for u in mine]
+        write_csv(market_rows, out_csv)
+        if PARQUET:
+            write_parquet(lambda: iter(market_rows), os.path.splitext(out_csv)[0] + ".parquet",
+                          LISTING_TYPES, "url")
+        emit("page.done", search=search_url, out_csv=out_csv, rows=len(market_rows))
+        print(f"✅ Recherche {n}: {len(market_rows)} ligne(s) → {out_csv}")
+    if changes:
+        write_delta(rows, sigs, changes, OUT_CSV.replace("{n}", "batch"))
+    selector_memory.save()
+    return rows
+
+def load_journal():
+    """Journal de reprise: recherche collectée + chaque annonce dès qu'elle est finie"""
+    done = journal_load(JOURNAL) if RESUME else {}
+    if not RESUME:
+        journal_reset(JOURNAL)
+    return done
+
 def main():
-    rows = []
+    start_live()
+    if SERVICE_MODE:
+        return serve()
+    emit("run.started", mode="batch" if BATCH_MODE else "search",
+         max_minutes=BATCH_MINUTES if BATCH_MODE else MAX_MINUTES)
     with sync_playwright() as p:
-        launch_args = {"headless": True}
-        if PROXY:
-            launch_args["proxy"] = {"server": PROXY}
-        browser = p.chromium.launch(**launch_args)
-        context = browser.new_context(
-            locale="fr-FR",
-            user_agent=("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-                        "(KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"),
-            viewport={"width":1280,"height":1600},
-            timezone_id="Europe/Paris",
-        )
+        browser = launch_browser(p)
+        context = new_context(browser)
         page = context.new_page()
 
-        urls = collect_listing_urls(page, MAX_LIST, MAX_MINUTES)
-        for u in urls:
-            rows.append(parse_listing(page, u))
-
-        write_csv(rows)
-        print(f"\n{'='*60}")
-        print(f"✅ SAVED {len(rows)} rows to {OUT_CSV}")
-        print(f"{'='*60}")
+        if BATCH_MODE:
+            scrape_batch(page, BATCH_FILE, load_journal())
+        else:
+            scrape_search(page, START_URL, OUT_CSV, load_journal())
+        emit("run.finished")
+        cache_close()
+        host_index_close()
+        print_summary()
+        proxy_pool.report()
 
         context.close()
         browser.close()
 
+# ---------------- mode service ----------------
+
+_out_lock = threading.Lock()
+
+def service_reply(*fields):
+    """Ligne de statut lisible par l'appelant (orchestrator.py): DONE/FAIL<TAB>..."""
+    with _out_lock:
+        print("\t".join(str(f) for f in fields), flush=True)
+
+class WarmContext:
+    """
+    Contexte navigateur longue durée: cookies et consentement conservés
+    (storage_state sur disque), renouvelé après MAX_CTX_FAILURES échecs d'affilée.
+    """
+
+    def __init__(self, browser, slot):
+        self.browser = browser
+        self.state_path = os.path.join(STATE_DIR, f"context_{slot}.json")
+        self.context = self.page = None
+        self.open()
+
+    def open(self):
+        has_state = os.path.exists(self.state_path)
+        self.context = new_context(self.browser, storage_state=self.state_path if has_state else None)
+        self.page = self.context.new_page()
+        self.consented = has_state
+        self.failures = 0
+        self.jobs = 0
+
+    def save_state(self):
+        try:
+            os.makedirs(STATE_DIR, exist_ok=True)
+            self.context.storage_state(path=self.state_path)
+        except Exception as e:
+            print(f"⚠ storage_state non sauvegardé: {e}")
+
+    def report(self, ok):
+        self.jobs += 1
+        if ok:
+            self.failures = 0
+            if not self.consented:
+                self.consented = True
+            self.save_state()
+            return
+        self.failures += 1
+        count("service.context_failure")
+        if self.failures >= MAX_CTX_FAILURES:
+            print(f"♻ Contexte en échec {self.failures} fois: rotation (état effacé)")
+            count("service.context_rotation")
+            self.close()
+            try:
+                os.remove(self.state_path)
+            except OSError:
+                pass
+            self.open()
+
+    def close(self):
+        try:
+            self.context.close()
+        except Exception:
+            pass
+
+def service_worker(slot, jobs):
+    try:
+        with sync_playwright() as p:
+            browser = launch_browser(p)
+            warm = WarmContext(browser, slot)
+            done = {}
+            while True:
+                job = jobs.get()
+                if job is None:
+                    break
+                tag, url, out_csv, done = job
+                try:
+                    rows = scrape_search(warm.page, url, out_csv, done, workers=1,
+                                         accept_cookies=not warm.consented)
+                    ok = any(r.get("title") or r.get("host_profile_url") for r in rows)
+                    warm.report(ok)
+                    service_reply("DONE", tag, out_csv, len(rows))
+                except Exception as e:
+                    warm.report(False)
+                    service_reply("FAIL", tag, str(e).replace("\t", " ").splitlines()[0] if str(e) else type(e).__name__)
+            warm.close()
+            browser.close()
+    except Exception as e:
+        print(f"❌ Worker service arrêté: {e}")
+
+def serve():
+    """
+    Mode service: SERVICE_POOL navigateurs restent chauds et traitent les URLs de
+    recherche lues sur stdin, une par ligne: "url[<TAB>out_csv[<TAB>tag]]".
+    Chaque page terminée est signalée par "DONE<TAB>tag<TAB>out_csv<TAB>lignes".
+    """
+    done = load_journal()
+    emit("run.started", mode="service")
+    jobs = queue.Queue()
+    threads = [threading.Thread(target=service_worker, args=(slot, jobs), daemon=True)
+               for slot in range(SERVICE_POOL)]
+    for t in threads:
+        t.start()
+    print(f"🔥 Service prêt: {SERVICE_POOL} contexte(s) chaud(s), lecture de stdin")
+
+    base, ext = os.path.splitext(OUT_CSV)
+    n = 0
+    for line in sys.stdin:
+        parts = line.rstrip("\n").split("\t")
+        url = parts[0].strip()
+        if not url or url.startswith("#"):
+            continue
+        n += 1
+        out_csv = parts[1].strip() if len(parts) > 1 and parts[1].strip() else f"{base}_{n}{ext}"
+        tag = parts[2].strip() if len(parts) > 2 and parts[2].strip() else url
+        jobs.put((tag, url, out_csv, done))
+    for _ in threads:
+        jobs.put(None)
+    for t in threads:
+        t.join()
+
+    emit("run.finished")
+    cache_close()
+    host_index_close()
+    print_summary()
+    proxy_pool.report()
+
 if __name__ == "__main__":
     main()
@@ -7,8 +7,8 @@ import puppeteer from "puppeteer";
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
-const INPUT_FILE = path.join(__dirname, "urls.txt");
-const OUT_DIR = path.join(__dirname, "output");
+const INPUT_FILE = process.env.URLS_FILE || path.join(__dirname, "urls.txt");
+const OUT_DIR = process.env.OUT_DIR || path.join(__dirname, "output");
 const OUT_CSV = path.join(OUT_DIR, "results.csv");
 const NOW_YEAR = new Date().getFullYear();
 const delay = (ms) => new Promise(r => setTimeout(r, ms));
@@ -30,7 +30,7 @@ function readUrls() {
 }
 
 function ensureOutDir() {
-  if (!fs.existsSync(OUT_DIR)) fs.mkdirSync(OUT_DIR);
+  if (!fs.existsSync(OUT_DIR)) fs.mkdirSync(OUT_DIR, { recursive: true });
   const dbg = path.join(OUT_DIR, "debug");
   if (!fs.existsSync(dbg)) fs.mkdirSync(dbg);
   return dbg;
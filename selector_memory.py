@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Mémoire des sélecteurs qui ont fonctionné, par domaine/locale
+(bouton cookies, "Lire la suite", bloc hôte...). Le dernier sélecteur gagnant
+est essayé en premier au prochain passage, y compris d'un run à l'autre.
+
+Pour les registres de stratégies (bloc hôte), on garde aussi essais, succès et
+latence cumulée par stratégie, et on les classe par taux de succès.
+"""
+
+import os
+import json
+import threading
+
+SELECTOR_MEMORY = os.getenv("SELECTOR_MEMORY", "selector_memory.json").strip()
+
+_lock = threading.Lock()
+_memory = {}
+_loaded = [False]
+_won = {}      # {(key, kind): sélecteur} gagnés par ce process depuis la dernière sauvegarde
+_delta = {}    # {(key, kind, stratégie): [essais, succès, ms]} idem
+
+def _read():
+    if not SELECTOR_MEMORY or not os.path.exists(SELECTOR_MEMORY):
+        return {}
+    try:
+        with open(SELECTOR_MEMORY, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _load():
+    if _loaded[0]:
+        return
+    _loaded[0] = True
+    _memory.update(_read())
+
+def memory_key(page, locale=""):
+    """'fr.airbnb.ca|fr-FR'"""
+    try:
+        host = page.url.split("/")[2]
+    except Exception:
+        host = ""
+    return f"{host}|{locale}"
+
+def ordered(kind, key, candidates):
+    """Les candidats, le dernier gagnant pour (kind, key) en tête"""
+    with _lock:
+        _load()
+        last = _memory.get(key, {}).get(kind)
+    if last in candidates:
+        return [last] + [c for c in candidates if c != last]
+    return list(candidates)
+
+def remember(kind, key, selector):
+    with _lock:
+        _load()
+        _memory.setdefault(key, {})[kind] = selector
+        _won[(key, kind)] = selector
+
+def record_strategy(kind, key, strategy, hit, ms):
+    with _lock:
+        _load()
+        stats = _memory.setdefault(key, {}).setdefault("_stats", {}).setdefault(kind, {})
+        tries, hits, total_ms = stats.get(strategy, [0, 0, 0.0])
+        stats[strategy] = [tries + 1, hits + (1 if hit else 0), round(total_ms + ms, 2)]
+        d = _delta.setdefault((key, kind, strategy), [0, 0, 0.0])
+        d[0] += 1
+        d[1] += 1 if hit else 0
+        d[2] += ms
+
+def ranked(kind, key, strategies):
+    """
+    Classe les stratégies par taux de succès lissé (hits+1)/(essais+2), puis par
+    latence moyenne; à égalité, l'ordre d'origine est conservé.
+    """
+    with _lock:
+        _load()
+        stats = dict(_memory.get(key, {}).get("_stats", {}).get(kind, {}))
+
+    def score(item):
+        idx, sid = item
+        tries, hits, total_ms = stats.get(sid, [0, 0, 0.0])
+        rate = (hits + 1) / (tries + 2)
+        avg_ms = total_ms / tries if tries else float("inf")
+        return (-rate, avg_ms, idx)
+
+    return [sid for _, sid in sorted(enumerate(strategies), key=score)]
+
+def save():
+    """
+    Fusionne avec le fichier tel qu'il est sur disque (les scrapers --parallel
+    partagent le même fichier): compteurs additionnés, derniers gagnants de ce
+    process par-dessus. Un échec d'écriture n'interrompt pas le run.
+    """
+    if not SELECTOR_MEMORY:
+        return
+    with _lock:
+        _load()
+        merged = _read()
+        for (key, kind), selector in _won.items():
+            merged.setdefault(key, {})[kind] = selector
+        for (key, kind, strategy), (tries, hits, ms) in _delta.items():
+            stats = merged.setdefault(key, {}).setdefault("_stats", {}).setdefault(kind, {})
+            t, h, total_ms = stats.get(strategy, [0, 0, 0.0])
+            stats[strategy] = [t + tries, h + hits, round(total_ms + ms, 2)]
+        tmp = f"{SELECTOR_MEMORY}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(merged, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, SELECTOR_MEMORY)
+        except OSError as e:
+            print(f"⚠ Mémoire des sélecteurs non sauvegardée: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        _won.clear()
+        _delta.clear()
+        _memory.clear()
+        _memory.update(merged)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Extraction texte: licence, note et année d'inscription de l'hôte, liens de profil
+hôte dans le HTML.
+
+Le texte d'une annonce fait souvent plusieurs centaines de Ko. Plutôt que de
+passer chaque regex sur tout le texte, on repère d'abord des ancres littérales
+(libellés, ★, •, "depuis"...) avec str.find, puis les motifs précompilés ne sont
+essayés que dans une petite fenêtre autour de chaque ancre. Les priorités
+d'origine sont conservées (1er libellé de LABELS présent, 1re forme de licence,
+1re forme de note).
+
+Fonctions pures, sans Playwright: testables et mesurables sur du HTML enregistré.
+"""
+
+import re
+
+# Libellés annonçant le numéro d'enregistrement, par priorité
+LABELS = [
+    "Infos d'enregistrement", "Détails de l'enregistrement",
+    "Registration details", "License", "Licence", "Permit",
+]
+LICENSE_WINDOW = 800
+
+# Formes de numéro de licence, par priorité
+RE_LICENSES = [
+    re.compile(r"\b[A-Z]{3}-[A-Z]{3}-[A-Z0-9]{4,6}\b"),
+    re.compile(r"\b\d{5,8}\b"),
+    re.compile(r"\b[A-Z0-9]{5,}\b"),
+]
+
+# Note de l'hôte, par priorité: (ancres, regex, position de l'ancre)
+# "after": le motif commence à l'ancre; "before": l'ancre suit un nombre.
+# Les ancres sont cherchées dans le texte en minuscules.
+NEAR = 64
+RATING_FORMS = [
+    (("★", "*"), re.compile(r"(\d+(?:[.,]\d+)?)\s*[★*]"), "before"),
+    (("note globale",), re.compile(r"Note globale\s*:?[\s\n]*([0-9]+(?:[.,][0-9]+)?)", re.I), "after"),
+    (("•", "·"), re.compile(r"(\d+(?:[.,]\d+)?)\s*[•·]\s*(?:avis|reviews)", re.I), "before"),
+]
+JOINED_FORM = (("depuis", "since"), re.compile(r"(?:depuis|since)\s+(?:\w+\s+)?(\d{4})", re.I), "after")
+
+# Liens de profil hôte dans le HTML brut, par priorité:
+# /profile/ absolu, /profile/ relatif, /show/ absolu, /show/ relatif
+RE_PROFILE_HREF = re.compile(r'href="(?P<abs>https?://[^"]*?)?/users/(?P<kind>profile|show)/(?P<rest>[^"?]+)')
+
+def anchors(text, needles):
+    """Positions croissantes de toutes les occurrences des `needles` dans `text`"""
+    found = []
+    for needle in needles:
+        i = text.find(needle)
+        while i >= 0:
+            found.append(i)
+            i = text.find(needle, i + 1)
+    return sorted(found)
+
+def number_start(text, i):
+    """Début du nombre (et des espaces) qui précède la position i"""
+    while i > 0 and text[i - 1].isspace():
+        i -= 1
+    while i > 0 and (text[i - 1].isdigit() or text[i - 1] in ".,"):
+        i -= 1
+    return i
+
+def search_near(text, lower, form):
+    """1re correspondance de la forme, cherchée seulement autour de ses ancres"""
+    needles, rx, where = form
+    if lower is None:
+        return rx.search(text)
+    for i in anchors(lower, needles):
+        if where == "after":
+            m = rx.match(text, i)
+        else:
+            m = rx.search(text, number_start(text, i), i + NEAR)
+        if m:
+            return m
+    return None
+
+def lowered(text):
+    """Texte en minuscules aligné sur l'original, None si lower() change la longueur"""
+    lower = text.lower()
+    return lower if len(lower) == len(text) else None
+
+def find_label(text):
+    """Position du libellé de licence le plus prioritaire présent (-1 si aucun)"""
+    for lbl in LABELS:
+        i = text.find(lbl)
+        if i >= 0:
+            return i
+    return -1
+
+def has_label(text):
+    return any(lbl in text for lbl in LABELS)
+
+def license_code(text, label_pos=-1):
+    """Numéro de licence dans la fenêtre qui suit le libellé (ou tout le texte)"""
+    if label_pos >= 0:
+        text = text[label_pos:label_pos + LICENSE_WINDOW]
+    for rx in RE_LICENSES:
+        m = rx.search(text)
+        if m:
+            return m.group(0)
+    return ""
+
+def license_from_text(text):
+    text = text or ""
+    return license_code(text, find_label(text))
+
+def host_stats_from_text(text):
+    """(note, année d'inscription) depuis le texte du bloc hôte ou de la page"""
+    text = text or ""
+    lower = lowered(text)
+    rating = ""
+    for form in RATING_FORMS:
+        m = search_near(text, lower, form)
+        if m:
+            rating = m.group(1).replace(",", ".")
+            break
+    m = search_near(text, lower, JOINED_FORM)
+    return rating, (m.group(1) if m else "")
+
+def extract_text_fields(text):
+    """Licence, note et année d'inscription depuis un même texte"""
+    text = text or ""
+    rating, joined = host_stats_from_text(text)
+    return {
+        "license_code": license_code(text, find_label(text)),
+        "host_overall_rating": rating,
+        "host_joined": joined,
+    }
+
+def profile_hrefs(html):
+    """Liens /users/profile/ et /users/show/ du HTML, du plus au moins prioritaire"""
+    found = {}
+    for m in RE_PROFILE_HREF.finditer(html or ""):
+        rank = (0 if m.group("kind") == "profile" else 2) + (0 if m.group("abs") else 1)
+        if rank not in found:
+            found[rank] = m.group(0)[len('href="'):]
+            if rank == 0:
+                break
+    return [found[r] for r in sorted(found)]